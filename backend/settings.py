@@ -53,6 +53,16 @@ INSTALLED_APPS = [
     "rest_framework",
 ]
 
+# ======================================================
+# REST FRAMEWORK
+# ======================================================
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "backend.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
 # ======================================================
 # MIDDLEWARE
 # ======================================================
@@ -81,11 +91,16 @@ WSGI_APPLICATION = "backend.wsgi.application"
 if "pytest" in sys.modules:
     # -------------------------------
     # SQLite DB for pytest
+    # Shared-cache in-memory URI so every connection/thread in the
+    # test process sees the same database.
     # -------------------------------
+    SQLITE_TEST_URI = "file:memdb1?mode=memory&cache=shared"
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
-            "NAME": ":memory:",
+            "NAME": SQLITE_TEST_URI,
+            "OPTIONS": {"uri": True},
+            "TEST": {"NAME": SQLITE_TEST_URI},
         }
     }
 else:
@@ -100,8 +115,19 @@ else:
             "PASSWORD": env("POSTGRES_PASSWORD"),
             "HOST": env("POSTGRES_HOST"),
             "PORT": env("POSTGRES_PORT"),
+            # No per-request transaction; read-only views open their own
+            # (see ingestion.api.list_documents).
+            "ATOMIC_REQUESTS": False,
             "OPTIONS": {
-                "options": "-c search_path=pdf-dataset-db" 
+                "options": "-c search_path=pdf-dataset-db",
+                # psycopg3 connection pool (Django 5.1+).
+                # Replaces CONN_MAX_AGE — Django rejects persistent
+                # connections when pooling is enabled.
+                "pool": {
+                    "min_size": 2,
+                    "max_size": 8,
+                    "timeout": 10,
+                },
             },
         }
     }
@@ -155,3 +181,10 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # CHROMA PATH (Render will mount /chroma disk)
 # ======================================================
 CHROMA_DISK_PATH = env("CHROMA_DISK_PATH", default="/chroma")
+
+# ======================================================
+# PREFECT (upload → queued deployment run)
+# ======================================================
+PDF_INGESTION_DEPLOYMENT = env(
+    "PDF_INGESTION_DEPLOYMENT", default="pdf-ingestion-flow/default"
+)
@@ -1,19 +1,28 @@
 import os
+import shutil
+import functools
 from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from pipelines.prefect_pdf_flow import pdf_ingestion_flow
+from prefect import get_client
+from prefect.deployments import run_deployment
+from prefect.exceptions import ObjectNotFound
+
 from etl.chroma_client import get_collection
-from etl.pdf_embedding import get_embedding_function
+from etl.pdf_embedding import get_embedding_function, normalize_vectors
 
-from django.db import connection
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from backend.renderers import ORJSONRenderer
 from .serializers import DocumentListSerializer
 
 @api_view(["POST"])
 def upload_pdf(request):
     """
-    Upload a PDF → Save to documents/ → Trigger Prefect pipeline
+    Upload a PDF → Save to documents/ → Queue Prefect pipeline run
+
+    Returns 202 immediately; poll /ingestion-status/<flow_run_id>/ for progress.
     """
     try:
         file = request.FILES.get("file")
@@ -27,20 +36,23 @@ def upload_pdf(request):
         # Full path where file will be saved
         save_path = os.path.join(documents_dir, file.name)
 
-        # Save the PDF file
-        with open(save_path, "wb+") as dest:
-            for chunk in file.chunks():
-                dest.write(chunk)
+        # Save the PDF file (1 MB copy buffer)
+        with open(save_path, "wb") as dest:
+            shutil.copyfileobj(file, dest, length=1024 * 1024)
 
-        # Trigger Prefect Flow
-        state = pdf_ingestion_flow(save_path)
+        # Submit Prefect deployment run (timeout=0 → don't wait for it)
+        flow_run = run_deployment(
+            name=settings.PDF_INGESTION_DEPLOYMENT,
+            parameters={"pdf_path": save_path},
+            timeout=0,
+        )
 
         return Response({
-            "status": "ok",
-            "message": "PDF uploaded and ingestion started",
+            "status": "queued",
+            "message": "PDF uploaded and ingestion queued",
             "file_saved_as": save_path,
-            "prefect_state": str(state)
-        })
+            "flow_run_id": str(flow_run.id),
+        }, status=202)
     except Exception as e:
         return Response(
             {"error": f"Failed to process file: {str(e)}"},
@@ -48,6 +60,42 @@ def upload_pdf(request):
         )
 
 
+@api_view(["GET"])
+def ingestion_status(request, flow_run_id):
+    """
+    Poll Prefect for the state of a queued ingestion run.
+    """
+    try:
+        with get_client(sync_client=True) as client:
+            flow_run = client.read_flow_run(flow_run_id)
+    except ObjectNotFound:
+        return Response({"error": f"Unknown flow run: {flow_run_id}"}, status=404)
+    except Exception as e:
+        return Response(
+            {"error": f"Failed to read flow run: {str(e)}"},
+            status=500
+        )
+
+    state = flow_run.state
+    return Response({
+        "flow_run_id": str(flow_run.id),
+        "state": state.type.value if state else None,
+        "state_name": state.name if state else None,
+    })
+
+
+@functools.lru_cache(maxsize=1024)
+def _embed_query(query: str) -> tuple[float, ...]:
+    """
+    Embed + unit-normalize a search query. Cached per exact query string
+    (embeddings are deterministic for a given model).
+    """
+    query_embedding = get_embedding_function()([query])[0]
+    if hasattr(query_embedding, "values"):
+        query_embedding = query_embedding.values  # fix for Gemini/OpenAI
+    return tuple(normalize_vectors([query_embedding])[0].tolist())
+
+
 @api_view(["POST"])
 def semantic_search(request):
     """
@@ -64,12 +112,9 @@ def semantic_search(request):
 
     # Load vector DB
     collection = get_collection("pdf_chunks")
-    embed_fn = get_embedding_function()
 
-    # Convert query into embedding
-    query_embedding = embed_fn([query])[0]
-    if hasattr(query_embedding, "values"):
-        query_embedding = query_embedding.values  # fix for Gemini/OpenAI
+    # Convert query into embedding (cached for repeated queries)
+    query_embedding = list(_embed_query(query))
 
     # Perform semantic search
     results = collection.query(
@@ -95,46 +140,120 @@ def semantic_search(request):
 
 
 
+# Keyset pagination for /documents/
+DOCUMENTS_PAGE_SIZE = 50
+DOCUMENTS_MAX_PAGE_SIZE = 1000
+# Rows pulled per round trip from the server-side cursor
+DOCUMENTS_FETCH_SIZE = 500
+
+
+def _stream_rows_as_json(query, params):
+    """
+    Run `query` on a server-side cursor and stream the rows as a JSON array.
+
+    The first next() executes the query and yields the column names (None if
+    the query returned no columns), so SQL errors surface before the response
+    starts. Every later item is a bytes fragment of the array.
+
+    Runs in a READ ONLY transaction on Postgres, which also lets the cursor
+    be a plain (non-WITH HOLD) server-side cursor.
+    """
+    renderer = ORJSONRenderer()
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as setup:
+                setup.execute("SET TRANSACTION READ ONLY")
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(query, params)
+
+            if cursor.description is None:
+                yield None
+                return
+
+            columns = [col[0] for col in cursor.description]
+            yield columns
+
+            yield b"["
+            first = True
+            while True:
+                rows = cursor.fetchmany(DOCUMENTS_FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    prefix = b"" if first else b","
+                    yield prefix + renderer.render(dict(zip(columns, row)))
+                    first = False
+            yield b"]"
+
+
 @api_view(["GET"])
 def list_documents(request):
-    with connection.cursor() as cursor:
-        query = """
-            SELECT
-                dm._dlt_load_id AS document_id,
-                dm.pdf_name,
-                dm.pdf_type,
-                dm.created_at,
-                COALESCE(ci.cost_items_count, 0) AS cost_items,
-                COALESCE(pt.project_tasks_count, 0) AS project_tasks,
-                COALESCE(ur.ura_rules_count, 0) AS ura_rules
-            FROM pdf_dataset.documents_master dm
-            LEFT JOIN (
-                SELECT document_id, COUNT(*) AS cost_items_count
-                FROM pdf_dataset.cost_items
-                GROUP BY document_id
-            ) ci ON dm._dlt_load_id = ci.document_id
-            LEFT JOIN (
-                SELECT document_id, COUNT(*) AS project_tasks_count
-                FROM pdf_dataset.project_tasks
-                GROUP BY document_id
-            ) pt ON dm._dlt_load_id = pt.document_id
-            LEFT JOIN (
-                SELECT document_id, COUNT(*) AS ura_rules_count
-                FROM pdf_dataset.regulatory_rules
-                GROUP BY document_id
-            ) ur ON dm._dlt_load_id = ur.document_id
-            ORDER BY dm._dlt_load_id DESC;
-        """
-
-        try:
-            cursor.execute(query)
-        except Exception as e:
-            return Response({"sql_error": str(e)}, status=500)
-
-        if cursor.description is None:
-            return Response({"error": "Query returned no columns"}, status=500)
-
-        columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
-
-    return Response([dict(zip(columns, row)) for row in rows])
+    """
+    List ingested documents with their structured-row counts, newest first.
+
+    Keyset pagination:
+        GET /documents/?limit=50
+        GET /documents/?after=<last document_id of previous page>&limit=50
+
+    Counts are only computed for the documents on the requested page.
+    Rows are streamed from a server-side cursor instead of fetchall().
+    """
+    after = request.query_params.get("after")
+    try:
+        limit = int(request.query_params.get("limit", DOCUMENTS_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "'limit' must be an integer"}, status=400)
+    limit = max(1, min(limit, DOCUMENTS_MAX_PAGE_SIZE))
+
+    params = []
+    keyset_filter = ""
+    if after:
+        keyset_filter = "WHERE _dlt_load_id < %s"
+        params.append(after)
+    params.append(limit)
+
+    query = f"""
+        WITH page AS (
+            SELECT _dlt_load_id, pdf_name, pdf_type, created_at
+            FROM pdf_dataset.documents_master
+            {keyset_filter}
+            ORDER BY _dlt_load_id DESC
+            LIMIT %s
+        ),
+        counts AS (
+            SELECT document_id, 'c' AS k FROM pdf_dataset.cost_items
+            WHERE document_id IN (SELECT _dlt_load_id FROM page)
+            UNION ALL
+            SELECT document_id, 'p' AS k FROM pdf_dataset.project_tasks
+            WHERE document_id IN (SELECT _dlt_load_id FROM page)
+            UNION ALL
+            SELECT document_id, 'u' AS k FROM pdf_dataset.regulatory_rules
+            WHERE document_id IN (SELECT _dlt_load_id FROM page)
+        )
+        SELECT
+            dm._dlt_load_id AS document_id,
+            dm.pdf_name,
+            dm.pdf_type,
+            dm.created_at,
+            COUNT(*) FILTER (WHERE c.k = 'c') AS cost_items,
+            COUNT(*) FILTER (WHERE c.k = 'p') AS project_tasks,
+            COUNT(*) FILTER (WHERE c.k = 'u') AS ura_rules
+        FROM page dm
+        LEFT JOIN counts c ON c.document_id = dm._dlt_load_id
+        GROUP BY dm._dlt_load_id, dm.pdf_name, dm.pdf_type, dm.created_at
+        ORDER BY dm._dlt_load_id DESC;
+    """
+
+    rows = _stream_rows_as_json(query, params)
+    try:
+        columns = next(rows)
+    except Exception as e:
+        return Response({"sql_error": str(e)}, status=500)
+
+    if columns is None:
+        rows.close()
+        return Response({"error": "Query returned no columns"}, status=500)
+
+    return StreamingHttpResponse(rows, content_type="application/json")
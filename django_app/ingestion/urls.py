@@ -1,8 +1,9 @@
 from django.urls import path
-from .api import upload_pdf, semantic_search,list_documents
+from .api import upload_pdf, semantic_search,list_documents, ingestion_status
 
 urlpatterns = [
     path("upload-pdf/", upload_pdf, name="upload_pdf"),
     path("search/", semantic_search,name="semantic_search"),
     path("documents/", list_documents,name="list_documents"),
-]
\ No newline at end of file
+    path("ingestion-status/<uuid:flow_run_id>/", ingestion_status, name="ingestion_status"),
+]
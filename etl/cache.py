@@ -0,0 +1,30 @@
+import os
+import hashlib
+from dotenv import load_dotenv
+from loguru import logger
+import diskcache
+
+load_dotenv()
+
+# ------------------------------------------------------
+# ETL CACHE DIRECTORY (Render or local)
+# ------------------------------------------------------
+ETL_CACHE_PATH = os.environ.get("ETL_CACHE_PATH", "./vectorstore/etl_cache")
+
+os.makedirs(ETL_CACHE_PATH, exist_ok=True)
+logger.info(f"[CACHE] Using disk path: {ETL_CACHE_PATH}")
+
+# SQLite-backed, safe to share between processes/threads
+cache = diskcache.Cache(ETL_CACHE_PATH)
+
+
+# ------------------------------------------------------
+# FILE HASH
+# ------------------------------------------------------
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file's bytes, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -1,4 +1,6 @@
 import os
+import functools
+import contextlib
 from dotenv import load_dotenv
 from loguru import logger
 import chromadb
@@ -19,30 +21,111 @@ client = chromadb.PersistentClient(path=CHROMA_DISK_PATH)
 
 
 # ------------------------------------------------------
-# GET COLLECTION
+# GET COLLECTION (cached per process)
 # ------------------------------------------------------
-def get_collection(name="pdf_chunks", recreate=False):
+@functools.lru_cache(maxsize=8)
+def get_collection(name="pdf_chunks"):
     """
     Returns or creates a persistent Chroma collection.
     Embeddings are supplied manually by your pipeline.
-    """
 
-    if recreate:
-        try:
-            client.delete_collection(name)
-            logger.warning(f"[CHROMA] Recreated collection: {name}")
-        except Exception:
-            logger.warning(f"[CHROMA] Collection did not exist: {name}")
+    Cached per collection name; use recreate_collection() to reset one.
+
+    Uses inner-product distance: vectors are unit-normalized before they
+    are added/queried, so this ranks exactly like cosine. The metric is
+    fixed when a collection is created — existing cosine collections keep
+    it until recreated.
+    """
 
     collection = client.get_or_create_collection(
         name=name,
-        metadata={"hnsw:space": "cosine"}
+        metadata={"hnsw:space": "ip"}
     )
 
     logger.info(f"[CHROMA] Loaded collection: {name}")
     return collection
 
 
+# ------------------------------------------------------
+# RECREATE COLLECTION
+# ------------------------------------------------------
+def recreate_collection(name="pdf_chunks"):
+    """
+    Drops the collection (if present), clears the get_collection cache
+    and returns a fresh, empty collection.
+    """
+
+    try:
+        client.delete_collection(name)
+        logger.warning(f"[CHROMA] Recreated collection: {name}")
+    except Exception:
+        logger.warning(f"[CHROMA] Collection did not exist: {name}")
+
+    get_collection.cache_clear()
+    return get_collection(name)
+
+
+# ------------------------------------------------------
+# BULK INGEST MODE (SQLite PRAGMAs)
+# ------------------------------------------------------
+# Relaxed durability for one-shot bulk loads. Not crash-safe: if the
+# process dies mid-load the store may need rebuilding from Postgres/PDFs.
+BULK_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "locking_mode": "EXCLUSIVE",
+}
+
+
+def _sqlite_connection():
+    """
+    The calling thread's connection to Chroma's SQLite metadata DB
+    (private Chroma API). Returns None when the Python SQLite component
+    is not running, e.g. Rust-backed Chroma >= 1.0 manages its own DB.
+    """
+    try:
+        from chromadb.db.impl.sqlite import SqliteDB
+
+        # Only reuse a running component — never start a second one
+        db = client._system._instances.get(SqliteDB)
+        if db is None:
+            logger.info("[CHROMA] No Python SQLite component, bulk PRAGMAs skipped")
+            return None
+        return db._conn_pool.connect()
+    except Exception as e:
+        logger.warning(f"[CHROMA] SQLite connection not reachable, bulk PRAGMAs skipped: {e}")
+        return None
+
+
+@contextlib.contextmanager
+def bulk_ingest():
+    """
+    Apply BULK_PRAGMAS to this thread's Chroma SQLite connection for the
+    duration of the block, then restore the previous values.
+    collection.add() calls must run on the same thread.
+    """
+    conn = _sqlite_connection()
+    if conn is None:
+        yield
+        return
+
+    previous = {}
+    for name, value in BULK_PRAGMAS.items():
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name}={value}")
+    logger.info(f"[CHROMA] Bulk ingest mode on: {BULK_PRAGMAS}")
+
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        # locking_mode=NORMAL only releases the lock on the next access
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        logger.info("[CHROMA] Bulk ingest mode off")
+
+
 # ------------------------------------------------------
 # ADD DOCUMENT
 # ------------------------------------------------------
@@ -6,6 +6,10 @@ load_dotenv()
 class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL")
+    # Native Matryoshka truncation for text-embedding-3-* (e.g. 512).
+    # Must match the vectors already stored in the Chroma collection.
+    OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS") or 0) or None
 
     PG_HOST = os.getenv("PG_HOST")
     PG_PORT = os.getenv("PG_PORT")
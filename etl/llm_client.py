@@ -1,9 +1,18 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+import httpx
+import asyncio
+import hashlib
 import time
 from loguru import logger
 import os
+import sys
 from dotenv import load_dotenv
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from etl.cache import cache
+
 load_dotenv()
 
 
@@ -14,8 +23,26 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 if not API_KEY:
     raise ValueError("OPENAI_API_KEY is not set!")
 
+# Shared HTTP/2 keep-alive pool: concurrent/retried calls reuse one TLS
+# connection instead of opening a new one per request.
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+
 # Initialize client
-client = OpenAI(api_key=API_KEY)
+client = OpenAI(
+    api_key=API_KEY,
+    http_client=DefaultHttpxClient(http2=True, limits=HTTP_LIMITS),
+)
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Transient API problems (429/503/rate limit/overload) are worth a retry."""
+    err = str(e)
+    return (
+        "429" in err or
+        "503" in err or
+        "rate limit" in err.lower() or
+        "temporarily" in err.lower()
+    )
 
 
 # ---------------------------------------------------------
@@ -46,15 +73,8 @@ def ask_llm(prompt: str, max_retries: int = 6):
             return response.output_text
 
         except Exception as e:
-            err = str(e)
-
             # Retry for transient API problems
-            if (
-                "429" in err or
-                "503" in err or
-                "rate limit" in err.lower() or
-                "temporarily" in err.lower()
-            ):
+            if _is_retryable(e):
                 wait = min(2 ** attempt, 15)
                 logger.warning(f"[LLM] OpenAI overloaded → retrying in {wait}s...")
                 time.sleep(wait)
@@ -63,3 +83,120 @@ def ask_llm(prompt: str, max_retries: int = 6):
             logger.error(f"[LLM] Unexpected error: {e}")
             raise
     raise RuntimeError(f" OpenAI model {PRIMARY_MODEL} failed after all retries.")
+
+
+# ---------------------------------------------------------
+# RESPONSE CACHE (exact prompt → output, persisted on disk)
+# ---------------------------------------------------------
+def _response_key(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"llm:{PRIMARY_MODEL}:{digest}"
+
+
+def ask_llm_cached(prompt: str, max_retries: int = 6) -> str:
+    """
+    ask_llm() with a persistent response cache keyed on model + SHA-256
+    of the prompt — re-running unchanged pages costs no API call.
+    """
+    key = _response_key(prompt)
+
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("[LLM] Response cache hit.")
+        return cached
+
+    output = ask_llm(prompt, max_retries=max_retries)
+    cache.set(key, output)
+    return output
+
+
+# ---------------------------------------------------------
+# ASYNC LLM CALLERS (many prompts concurrently)
+# ---------------------------------------------------------
+async def ask_llm_async(prompt: str, aclient: AsyncOpenAI, max_retries: int = 6):
+    """
+    Async twin of ask_llm() — same retry/backoff, but sleeps without
+    blocking the event loop so other prompts keep going.
+    """
+
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"[LLM] Calling {PRIMARY_MODEL} async (Attempt {attempt + 1})...")
+
+            response = await aclient.responses.create(
+                model=PRIMARY_MODEL,
+                input=prompt
+            )
+
+            logger.info("[LLM] Response received.")
+            return response.output_text
+
+        except Exception as e:
+            if _is_retryable(e):
+                wait = min(2 ** attempt, 15)
+                logger.warning(f"[LLM] OpenAI overloaded → retrying in {wait}s...")
+                await asyncio.sleep(wait)
+                continue
+
+            logger.error(f"[LLM] Unexpected error: {e}")
+            raise
+    raise RuntimeError(f" OpenAI model {PRIMARY_MODEL} failed after all retries.")
+
+
+async def ask_llm_many(
+    prompts: list[str],
+    max_concurrency: int | None = None,
+    return_exceptions: bool = False,
+    cached: bool = False,
+) -> list:
+    """
+    Send all prompts concurrently; returns outputs in prompt order.
+
+    max_concurrency caps in-flight requests (None = all at once).
+    With return_exceptions=True a failed prompt yields its exception
+    instead of failing the whole batch.
+    With cached=True, prompts found in the response cache (see
+    ask_llm_cached) are not sent; new outputs are cached.
+
+    The async client is created per call because its connection pool is
+    bound to the running event loop (each asyncio.run() gets a new one).
+
+    Usage:
+        outputs = asyncio.run(ask_llm_many(prompts))
+    """
+    if cached:
+        keys = [_response_key(p) for p in prompts]
+        outputs = [cache.get(k) for k in keys]
+        misses = [i for i, out in enumerate(outputs) if out is None]
+        logger.info(f"[LLM] Response cache: {len(prompts) - len(misses)}/{len(prompts)} hits.")
+
+        if misses:
+            fresh = await ask_llm_many(
+                [prompts[i] for i in misses],
+                max_concurrency=max_concurrency,
+                return_exceptions=return_exceptions,
+            )
+            for i, out in zip(misses, fresh):
+                outputs[i] = out
+                if not isinstance(out, BaseException):
+                    cache.set(keys[i], out)
+
+        return outputs
+
+    sem = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async with AsyncOpenAI(
+        api_key=API_KEY,
+        http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS),
+    ) as aclient:
+
+        async def _one(prompt: str) -> str:
+            if sem is None:
+                return await ask_llm_async(prompt, aclient)
+            async with sem:
+                return await ask_llm_async(prompt, aclient)
+
+        return await asyncio.gather(
+            *(_one(prompt) for prompt in prompts),
+            return_exceptions=return_exceptions,
+        )
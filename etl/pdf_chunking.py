@@ -1,19 +1,47 @@
+import os
 import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
 from loguru import logger
-import pdfplumber
+import fitz  # PyMuPDF
+
+# Max pages extracted in parallel (CPU-bound → processes, not threads)
+MAX_CHUNK_WORKERS = os.cpu_count() or 1
+# Max contiguous pages handled by one worker task (one PDF open per range)
+LOAD_RANGE_PAGES = 16
+
+
+# --------------------------------------------------------
+# Helper: chunk ids (many UUID4s from one urandom call)
+# --------------------------------------------------------
+
+def uuid4_batch(n: int) -> List[str]:
+    """
+    n random (version 4) UUID strings from ONE os.urandom() call,
+    formatted by slicing a single hex string instead of n uuid4() objects.
+    """
+    raw = bytearray(os.urandom(16 * n))
+    # RFC 4122 version (4) and variant (10xx) bits
+    raw[6::16] = bytes((b & 0x0F) | 0x40 for b in raw[6::16])
+    raw[8::16] = bytes((b & 0x3F) | 0x80 for b in raw[8::16])
+    h = raw.hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * n, 32)
+    ]
 
 
 # --------------------------------------------------------
 # Helper: normalize chunk
 # --------------------------------------------------------
 
-def make_chunk(text: str, metadata: dict) -> dict:
+def make_chunk(text: str, metadata: dict, chunk_id: str = None) -> dict:
     """
     Standard chunk object format.
     """
     return {
-        "id": str(uuid.uuid4()),
+        "id": chunk_id or str(uuid.uuid4()),
         "text": (text or "").strip(),
         "metadata": metadata or {},
     }
@@ -25,60 +53,57 @@ def make_chunk(text: str, metadata: dict) -> dict:
 
 def table_to_markdown(table: List[List[str]]) -> str:
     """
-    Convert a single pdfplumber table (list of rows) into a markdown-ish string.
+    Convert a single extracted table (list of rows) into a markdown-ish string.
 
     We keep the first non-empty row as header and normalise row lengths.
+    Cells are cleaned, the widest row and the header are found in one pass.
     """
     if not table:
         return ""
 
-    # Clean cells
     cleaned: List[List[str]] = []
-    for row in table:
-        cleaned.append([(cell or "").replace("\n", " ").strip() for cell in row])
-
-    # Find first non-empty row as header
-    header_idx = 0
-    for idx, row in enumerate(cleaned):
-        if any(cell for cell in row):
-            header_idx = idx
-            break
+    max_cols = 0
+    header_idx = -1
 
-    header = cleaned[header_idx]
-    body = cleaned[header_idx + 1 :]
-
-    # normalise row length
-    max_cols = max(len(r) for r in cleaned)
-    def norm(r: List[str]) -> List[str]:
-        return r + [""] * (max_cols - len(r))
+    for row in table:
+        cells = [(cell or "").replace("\n", " ").strip() for cell in row]
+        if len(cells) > max_cols:
+            max_cols = len(cells)
+        if header_idx < 0 and any(cells):
+            header_idx = len(cleaned)
+        cleaned.append(cells)
 
-    header = norm(header)
-    body = [norm(r) for r in body]
+    if header_idx < 0:
+        header_idx = 0
 
     lines: List[str] = []
-    lines.append("| " + " | ".join(header) + " |")
-    lines.append("| " + " | ".join(["---"] * len(header)) + " |")
-
-    for row in body:
+    for row in cleaned[header_idx:]:
+        if len(row) < max_cols:
+            row.extend([""] * (max_cols - len(row)))
         lines.append("| " + " | ".join(row) + " |")
 
+    # separator goes right after the header
+    lines.insert(1, "| " + " | ".join(["---"] * max_cols) + " |")
+
     return "\n".join(lines)
 
 
 # --------------------------------------------------------
-# Extract content from a single pdfplumber page
+# Extract content from a single PyMuPDF page
 # --------------------------------------------------------
 
 def extract_page_content(page, page_number: int, include_tables: bool = True,
-                         max_text_chars: int = 8000) -> str:
+                         max_text_chars: int = 8000) -> dict:
     """
-    Extract text + (optionally) tables (as markdown) from a single page and
-    return one big string that will then be chunked.
+    Extract text + (optionally) tables (as markdown) from a single
+    PyMuPDF (fitz) page.
 
     - Text is trimmed to max_text_chars to avoid huge prompts.
+
+    Returns dict with 'page_number', 'text' and 'tables_markdown'.
     """
     # Text
-    text = page.extract_text() or ""
+    text = page.get_text("text") or ""
     text = text.strip()
     if max_text_chars and len(text) > max_text_chars:
         text = text[:max_text_chars]
@@ -87,7 +112,7 @@ def extract_page_content(page, page_number: int, include_tables: bool = True,
     tables_markdown = ""
     if include_tables:
         try:
-            tables = page.extract_tables() or []
+            tables = [tbl.extract() for tbl in page.find_tables().tables]
         except Exception as e:
             logger.warning(f"[PDF] Table extraction failed on page {page_number}: {e}")
             tables = []
@@ -101,15 +126,24 @@ def extract_page_content(page, page_number: int, include_tables: bool = True,
         if md_tables:
             tables_markdown = "\n\n".join(md_tables)
 
-    # Combine
+    return {
+        "page_number": page_number,
+        "text": text,
+        "tables_markdown": tables_markdown,
+    }
+
+
+def page_content_to_text(page_content: dict) -> str:
+    """
+    Combine a page's text + tables markdown into the one string we chunk.
+    """
     parts: List[str] = []
-    if text:
-        parts.append(text)
-    if tables_markdown:
-        parts.append(tables_markdown)
+    if page_content["text"]:
+        parts.append(page_content["text"])
+    if page_content["tables_markdown"]:
+        parts.append(page_content["tables_markdown"])
 
-    full = "\n\n".join(parts).strip()
-    return full
+    return "\n\n".join(parts).strip()
 
 
 # --------------------------------------------------------
@@ -131,97 +165,174 @@ def chunk_page_text(page_text: str,
       - local_chunk_index (within that page)
       - global_chunk_index (across whole PDF)
     """
-    words = page_text.split()
-    chunks: List[dict] = []
+    step = chunk_size_words - overlap_words
+    if step <= 0:
+        raise ValueError(
+            f"overlap_words ({overlap_words}) must be smaller than "
+            f"chunk_size_words ({chunk_size_words})"
+        )
 
+    words = page_text.split()
     if not words:
-        return chunks
+        return []
+
+    # Window starts; stop once a window has reached the last word.
+    starts = range(0, max(len(words) - overlap_words, 1), step)
+    ids = uuid4_batch(len(starts))
+
+    return [
+        make_chunk(
+            " ".join(words[start:start + chunk_size_words]),
+            {
+                "pdf_type": pdf_type,
+                "page_number": page_number,
+                "local_chunk_index": local_index,
+                "global_chunk_index": global_chunk_start_index + local_index,
+            },
+            ids[local_index],
+        )
+        for local_index, start in enumerate(starts)
+    ]
+
+
+# --------------------------------------------------------
+# Page-range worker (used in process pool)
+# --------------------------------------------------------
+
+def _extract_page_range(pdf_path: str, start: int, end: int, include_tables: bool) -> List[dict]:
+    """
+    Open the PDF once and extract pages [start, end) (1-based), in order.
+    """
+    logger.info(f"[PAGES] Reading pages {start}–{end - 1}")
 
-    start = 0
-    local_index = 0
-    global_index = global_chunk_start_index
+    with fitz.open(pdf_path) as pdf:
+        return [
+            extract_page_content(
+                pdf[page_idx - 1],
+                page_number=page_idx,
+                include_tables=include_tables,
+                max_text_chars=8000,
+            )
+            for page_idx in range(start, end)
+        ]
 
-    while start < len(words):
-        end = min(start + chunk_size_words, len(words))
-        text_block = " ".join(words[start:end])
 
-        metadata = {
-            "pdf_type": pdf_type,
-            "page_number": page_number,
-            "local_chunk_index": local_index,
-            "global_chunk_index": global_index,
-        }
+# --------------------------------------------------------
+# Parse a PDF once → per-page text + tables
+# --------------------------------------------------------
 
-        chunks.append(make_chunk(text_block, metadata))
+def load_pages(pdf_path: str, include_tables: bool = True) -> List[dict]:
+    """
+    Parse the whole PDF once (pages in parallel worker processes).
 
-        local_index += 1
-        global_index += 1
+    Returns a list (in page order) of:
+      { "page_number": int, "text": str, "tables_markdown": str }
 
-        if end == len(words):
-            break
+    Feed the result to both classify_from_pages() and chunk_from_pages()
+    so the PDF isn't parsed twice.
+    """
+    logger.info(f"[PAGES] Opening PDF → {pdf_path}")
 
-        # slide window with overlap
-        start = max(0, end - overlap_words)
+    with fitz.open(pdf_path) as pdf:
+        num_pages = pdf.page_count
+    logger.info(f"[PAGES] Total pages in PDF: {num_pages}")
 
-    return chunks
+    if num_pages <= 1:
+        # single page → no process pool
+        return _extract_page_range(pdf_path, 1, num_pages + 1, include_tables)
+
+    # contiguous ranges → each worker opens the PDF once per range
+    workers = min(MAX_CHUNK_WORKERS, num_pages)
+    step = min(-(-num_pages // workers), LOAD_RANGE_PAGES)  # ceil division
+    ranges = [(s, min(s + step, num_pages + 1)) for s in range(1, num_pages + 1, step)]
+    workers = min(workers, len(ranges))
+
+    logger.info(
+        f"[PAGES] Starting process pool with {workers} workers "
+        f"for {num_pages} pages ({len(ranges)} ranges)."
+    )
+    # spawn, not fork: called from a Prefect task thread while other
+    # threads (API client, event loop, loguru sinks) may hold locks
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = [
+            executor.submit(_extract_page_range, pdf_path, s, e, include_tables)
+            for s, e in ranges
+        ]
+        # submission order == page order
+        return [page for f in futures for page in f.result()]
 
 
 # --------------------------------------------------------
-# Main: chunk an entire PDF (universal, page-based)
+# Chunk already-extracted pages
 # --------------------------------------------------------
 
-def chunk_pdf(pdf_path: str,
-              pdf_type: str,
-              chunk_size_words: int = 400,
-              overlap_words: int = 50,
-              include_tables: bool = True) -> List[dict]:
+def chunk_from_pages(pages: List[dict],
+                     pdf_type: str,
+                     chunk_size_words: int = 400,
+                     overlap_words: int = 50) -> List[dict]:
     """
-    Chunk the *complete PDF* into overlapping text chunks.
+    Chunk pages from load_pages() into overlapping text chunks.
 
-    - Reads each page via pdfplumber.
-    - Extracts text (and optionally markdown tables).
     - Splits into chunks of chunk_size_words with overlap_words.
     - Adds metadata for pdf_type, page_number, local & global chunk indexes.
     """
-    logger.info(f"[CHUNK] Opening PDF for chunking → {pdf_path}")
     chunks: List[dict] = []
     global_chunk_index = 0
 
-    with pdfplumber.open(pdf_path) as pdf:
-        num_pages = len(pdf.pages)
-        logger.info(f"[CHUNK] Total pages in PDF: {num_pages}")
-
-        for page_idx, page in enumerate(pdf.pages, start=1):
-            logger.info(f"[CHUNK] Processing page {page_idx}/{num_pages}")
-
-            page_text = extract_page_content(
-                page,
-                page_number=page_idx,
-                include_tables=include_tables,
-                max_text_chars=8000,
-            )
+    for page in pages:
+        page_number = page["page_number"]
+        page_text = page_content_to_text(page)
 
-            # Skip empty pages
-            if not any(c.isalnum() for c in page_text):
-                logger.info(f"[CHUNK] Page {page_idx} is effectively empty; skipping.")
-                continue
+        # Skip empty pages
+        if not any(c.isalnum() for c in page_text):
+            logger.info(f"[CHUNK] Page {page_number} is effectively empty; skipping.")
+            continue
 
-            page_chunks = chunk_page_text(
-                page_text=page_text,
-                pdf_type=pdf_type,
-                page_number=page_idx,
-                chunk_size_words=chunk_size_words,
-                overlap_words=overlap_words,
-                global_chunk_start_index=global_chunk_index,
-            )
+        page_chunks = chunk_page_text(
+            page_text=page_text,
+            pdf_type=pdf_type,
+            page_number=page_number,
+            chunk_size_words=chunk_size_words,
+            overlap_words=overlap_words,
+            global_chunk_start_index=global_chunk_index,
+        )
 
-            chunks.extend(page_chunks)
-            global_chunk_index += len(page_chunks)
+        chunks.extend(page_chunks)
+        global_chunk_index += len(page_chunks)
 
     logger.success(f"[CHUNK] Finished chunking PDF. Total chunks: {len(chunks)}")
     return chunks
 
 
+# --------------------------------------------------------
+# Main: chunk an entire PDF (universal, page-based)
+# --------------------------------------------------------
+
+def chunk_pdf(pdf_path: str,
+              pdf_type: str,
+              chunk_size_words: int = 400,
+              overlap_words: int = 50,
+              include_tables: bool = True) -> List[dict]:
+    """
+    Chunk the *complete PDF* into overlapping text chunks.
+
+    Shortcut for load_pages() + chunk_from_pages() when the pages
+    aren't needed elsewhere.
+    """
+    logger.info(f"[CHUNK] Opening PDF for chunking → {pdf_path}")
+    pages = load_pages(pdf_path, include_tables=include_tables)
+
+    return chunk_from_pages(
+        pages,
+        pdf_type=pdf_type,
+        chunk_size_words=chunk_size_words,
+        overlap_words=overlap_words,
+    )
+
+
 # --------------------------------------------------------
 # Compatibility / single entry point
 # --------------------------------------------------------
@@ -241,6 +352,8 @@ def chunk_document(pdf_path: str,
         chunks = chunk_document(pdf_path, pdf_type)
 
     This now chunks the **complete PDF**, not the extracted JSON.
+    If the pages were already parsed with load_pages(), call
+    chunk_from_pages() instead.
     """
     return chunk_pdf(
         pdf_path=pdf_path,
@@ -1,14 +1,17 @@
 import os, sys
 import re
-import json
+import asyncio
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
-from etl.llm_client import ask_llm
+from etl.llm_client import ask_llm, ask_llm_many
+from etl.cache import cache, file_sha256
 from etl.prompts import PDF_CLASSIFICATION_PROMPT
-import pdfplumber
+import fitz  # PyMuPDF
 import pytesseract
 from pdf2image import convert_from_path
 
@@ -17,11 +20,16 @@ from pdf2image import convert_from_path
 # TEXT CLEANING
 # ============================================================
 
+_RE_SPACES = re.compile(r"[ ]{2,}")
+_RE_NEWLINES = re.compile(r"\n{3,}")
+_DROP_NUL = {0: None}
+
+
 def clean_text(text: str) -> str:
     """Normalize text for stable LLM classification."""
-    text = text.replace("\x00", "")                     
-    text = re.sub(r"[ ]{2,}", " ", text)                
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = text.translate(_DROP_NUL)
+    text = _RE_SPACES.sub(" ", text)
+    text = _RE_NEWLINES.sub("\n\n", text)
     text = text.strip()
     return text
 
@@ -30,26 +38,55 @@ def clean_text(text: str) -> str:
 # TEXT EXTRACTION (PDF → TEXT → LLM)
 # ============================================================
 
-def extract_text(pdf_path: str) -> str:
-    logger.info(f"[EXTRACT] Reading PDF: {pdf_path}")
+# OCR fallback: tesseract cost grows ~quadratically with DPI; 150 is
+# plenty for classification. Tesseract releases the GIL, so pages are
+# OCR'd on threads.
+OCR_DPI = 150
+OCR_WORKERS = os.cpu_count() or 1
+
+# PDFs hashed / text-extracted concurrently in detect_pdf_types
+# (file reads, hashing and tesseract all release the GIL)
+CLASSIFY_PREP_WORKERS = 4
+
+
+def _ocr_images(images) -> list[str]:
+    """OCR page images in parallel, preserving page order."""
+    if len(images) <= 1:
+        return [pytesseract.image_to_string(img) for img in images]
+
+    with ThreadPoolExecutor(max_workers=min(OCR_WORKERS, len(images))) as ex:
+        return list(ex.map(pytesseract.image_to_string, images))
+
+
+def extract_text(pdf_path: str, pages: list[dict] | None = None) -> str:
+    """
+    PDF → cleaned, trimmed text for classification.
 
+    If `pages` (from pdf_chunking.load_pages) is given, their text is
+    reused instead of parsing the PDF again; pdf_path is then only
+    opened for the OCR fallback.
+    """
     extracted = ""
 
-    # ---- 1) Try direct PDF text extraction ----
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            pages = [(p.extract_text() or "") for p in pdf.pages]
-            extracted = "\n".join(pages).strip()
-    except Exception as e:
-        logger.error(f"[EXTRACT] pdfplumber failed: {e}")
+    # ---- 1) Reuse pre-extracted pages / direct PDF text extraction ----
+    if pages is not None:
+        logger.info(f"[EXTRACT] Using {len(pages)} pre-extracted pages: {pdf_path}")
+        extracted = "\n".join(p["text"] for p in pages).strip()
+    else:
+        logger.info(f"[EXTRACT] Reading PDF: {pdf_path}")
+        try:
+            with fitz.open(pdf_path) as pdf:
+                extracted = "\n".join(p.get_text("text") for p in pdf).strip()
+        except Exception as e:
+            logger.error(f"[EXTRACT] PyMuPDF failed: {e}")
 
     # ---- 2) OCR fallback if extraction too small ----
     if len(extracted) < 100:
         logger.warning("[EXTRACT] Very small text → Using OCR fallback")
 
         try:
-            images = convert_from_path(pdf_path, dpi=200)
-            ocr_texts = [pytesseract.image_to_string(img) for img in images]
+            images = convert_from_path(pdf_path, dpi=OCR_DPI, thread_count=OCR_WORKERS)
+            ocr_texts = _ocr_images(images)
             extracted = "\n".join(ocr_texts).strip()
         except Exception as e:
             logger.error(f"[EXTRACT] OCR failed: {e}")
@@ -70,14 +107,14 @@ def extract_text(pdf_path: str) -> str:
 # RAW CLASSIFIER (calls LLM)
 # ============================================================
 
-def classify_pdf(pdf_path: str) -> str:
+def classify_pdf(pdf_path: str, pages: list[dict] | None = None) -> str:
     """
     Calls Gemini with the classification prompt.
     Returns RAW JSON STRING from the LLM.
     """
     logger.info(f"[CLASSIFIER] Running LLM classification → {pdf_path}")
 
-    content = extract_text(pdf_path)
+    content = extract_text(pdf_path, pages=pages)
 
     # Build prompt
     prompt = PDF_CLASSIFICATION_PROMPT.replace("{{CONTENT}}", content)
@@ -90,6 +127,59 @@ def classify_pdf(pdf_path: str) -> str:
     return llm_output
 
 
+# ============================================================
+# PARSE RAW LLM OUTPUT
+# ============================================================
+
+def parse_classifier_output(raw_json: str) -> dict:
+    """
+    Cleans wrapper formatting from the raw LLM output
+    → Parses into Python dict
+    """
+    # Removes ```json ... ```
+    cleaned = raw_json.strip().strip("```").strip()
+
+    # Sometimes model writes “json” inside the code fence
+    cleaned = cleaned.replace("json", "").strip()
+
+    try:
+        parsed = orjson.loads(cleaned)
+    except orjson.JSONDecodeError as e:
+        logger.error(f"[CLASSIFIER] JSON decode failed: {e}")
+        logger.error(f"RAW CONTENT:\n{cleaned}")
+        raise e
+
+    logger.success(f"[CLASSIFIER] Final parsed result → {parsed}")
+    return parsed
+
+
+# ============================================================
+# CLASSIFICATION CACHE (keyed by SHA-256 of the PDF bytes)
+# ============================================================
+
+def _get_cached_type(digest: str) -> dict | None:
+    cached = cache.get(f"pdftype:{digest}")
+    return orjson.loads(cached) if cached is not None else None
+
+
+def _set_cached_type(digest: str, parsed: dict) -> None:
+    cache.set(f"pdftype:{digest}", orjson.dumps(parsed))
+
+
+def _classify_cached(pdf_path: str, pages: list[dict] | None = None) -> dict:
+    """Return the cached classification for this file, else ask the LLM."""
+    digest = file_sha256(pdf_path)
+
+    cached = _get_cached_type(digest)
+    if cached is not None:
+        logger.info(f"[CLASSIFIER] Cache hit ({digest[:12]}) → {pdf_path}")
+        return cached
+
+    parsed = parse_classifier_output(classify_pdf(pdf_path, pages=pages))
+    _set_cached_type(digest, parsed)
+    return parsed
+
+
 # ============================================================
 # PARSED CLASSIFIER (used by Prefect)
 # ============================================================
@@ -100,6 +190,8 @@ def detect_pdf_type(pdf_path: str) -> dict:
     → Cleans wrapper formatting
     → Parses into Python dict
 
+    Results are cached by file hash, so re-uploads skip the LLM.
+
     Returns:
     {
         "pdf_type": "construction_costing",
@@ -108,22 +200,55 @@ def detect_pdf_type(pdf_path: str) -> dict:
         "reason": "..."
     }
     """
-    raw_json = classify_pdf(pdf_path)
+    return _classify_cached(pdf_path)
 
-    # Removes ```json ... ```
-    cleaned = raw_json.strip().strip("```").strip()
 
-    # Sometimes model writes “json” inside the code fence
-    cleaned = cleaned.replace("json", "").strip()
+def classify_from_pages(pages: list[dict], pdf_path: str) -> dict:
+    """
+    Same as detect_pdf_type(), but classifies pages already parsed by
+    pdf_chunking.load_pages() — the PDF is not opened again
+    (except for the OCR fallback on near-empty text).
+    """
+    return _classify_cached(pdf_path, pages=pages)
 
-    try:
-        parsed = json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        logger.error(f"[CLASSIFIER] JSON decode failed: {e}")
-        logger.error(f"RAW CONTENT:\n{cleaned}")
-        raise e
 
-    logger.success(f"[CLASSIFIER] Final parsed result → {parsed}")
-    return parsed
+# ============================================================
+# BATCH CLASSIFIER (many PDFs, concurrent LLM calls)
+# ============================================================
+
+def detect_pdf_types(pdf_paths: list[str]) -> list[dict]:
+    """
+    Same as detect_pdf_type() for several PDFs, but all classification
+    prompts are sent to the LLM concurrently.
+
+    Returns parsed results in the same order as pdf_paths.
+    Cached files are not sent to the LLM. Hashing and text extraction
+    also run concurrently across PDFs.
+    """
+    workers = max(1, min(CLASSIFY_PREP_WORKERS, len(pdf_paths)))
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        digests = list(ex.map(file_sha256, pdf_paths))
+        results = [_get_cached_type(d) for d in digests]
+        misses = [i for i, r in enumerate(results) if r is None]
+
+        logger.info(
+            f"[CLASSIFIER] Running batched LLM classification for {len(misses)} PDFs "
+            f"({len(pdf_paths) - len(misses)} cached)"
+        )
+
+        texts = list(ex.map(extract_text, [pdf_paths[i] for i in misses]))
+
+    if misses:
+        prompts = [
+            PDF_CLASSIFICATION_PROMPT.replace("{{CONTENT}}", text)
+            for text in texts
+        ]
+
+        raw_outputs = asyncio.run(ask_llm_many(prompts))
 
+        for i, raw in zip(misses, raw_outputs):
+            results[i] = parse_classifier_output(raw)
+            _set_cached_type(digests[i], results[i])
 
+    return results
@@ -1,14 +1,23 @@
 import os
 import sys
-from typing import List, Dict, Any
+import time
+import hashlib
+import random
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
+import numpy as np
 from loguru import logger
 from dotenv import load_dotenv
+from chromadb.errors import IDAlreadyExistsError
 
-from etl.chroma_client import get_collection
+from etl.cache import cache
+from etl.chroma_client import get_collection, bulk_ingest
 from etl.config import settings
 
 from langchain_openai import OpenAIEmbeddings
@@ -20,18 +29,24 @@ load_dotenv()
 #    EMBEDDING CLIENT (LangChain OpenAI)
 # ============================================================
 
+@functools.lru_cache(maxsize=1)
 def get_embedding_function():
     """
     Returns an embedding function using LangChain's OpenAIEmbeddings.
     Uses:
       - settings.OPENAI_EMBEDDING_MODEL if present
       - else falls back to "text-embedding-3-small"
+      - settings.OPENAI_EMBEDDING_DIMENSIONS to request shorter vectors
+        (e.g. 512 instead of 1536 → 3× less Chroma storage / HNSW bandwidth)
+
+    Cached so the OpenAI client is built once per process.
     """
 
     model_name = getattr(settings, "OPENAI_EMBEDDING_MODEL", None) or "text-embedding-3-small"
+    dimensions = getattr(settings, "OPENAI_EMBEDDING_DIMENSIONS", None)
 
-    logger.info(f"Using OpenAIEmbeddings (model={model_name}) for embeddings.")
-    emb = OpenAIEmbeddings(model=model_name)
+    logger.info(f"Using OpenAIEmbeddings (model={model_name}, dimensions={dimensions or 'default'}) for embeddings.")
+    emb = OpenAIEmbeddings(model=model_name, dimensions=dimensions)
 
     def embed_fn(texts: List[str]) -> List[List[float]]:
         """
@@ -42,6 +57,270 @@ def get_embedding_function():
     return embed_fn
 
 
+# ============================================================
+#    PERSISTENT EMBEDDING CACHE (SHA-256 of text → float16 bytes)
+# ============================================================
+
+# Cached vectors are stored as float16: half the disk/IO of float32, and
+# the rounding error (~1e-3 relative) is far below cosine-ranking noise.
+EMBEDDING_CACHE_DTYPE = np.float16
+
+def _embedding_model_tag() -> str:
+    """Model + dimensions — vectors from different settings never mix."""
+    model_name = getattr(settings, "OPENAI_EMBEDDING_MODEL", None) or "text-embedding-3-small"
+    dimensions = getattr(settings, "OPENAI_EMBEDDING_DIMENSIONS", None)
+    return f"{model_name}:{dimensions or 'default'}"
+
+
+def _embedding_key(model_tag: str, text: str) -> str:
+    return f"emb16:{model_tag}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+@functools.lru_cache(maxsize=1)
+def get_cached_embedding_function():
+    """
+    Wraps get_embedding_function() with the on-disk ETL cache: only texts
+    never embedded before (for this model) are sent to the API. Re-ingesting
+    a PDF, or chunks shared between PDFs, costs no embedding calls.
+
+    Returns raw (un-normalized) float32 vectors at cache precision
+    (float16-rounded) on hits and misses alike.
+    """
+    embed_fn = get_embedding_function()
+    model_tag = _embedding_model_tag()
+
+    def cached_embed_fn(texts: List[str]) -> List[np.ndarray]:
+        keys = [_embedding_key(model_tag, t) for t in texts]
+
+        # plain reads: transact() takes SQLite's write lock (BEGIN IMMEDIATE)
+        # and would serialize every embedding thread on lookups
+        blobs = [cache.get(k) for k in keys]
+
+        vectors = [
+            None if b is None else np.frombuffer(b, dtype=EMBEDDING_CACHE_DTYPE).astype(np.float32)
+            for b in blobs
+        ]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+
+        if missing:
+            fresh = embed_fn([texts[i] for i in missing])
+            if len(fresh) != len(missing):
+                raise ValueError(
+                    f"Embedding batch size mismatch: got {len(fresh)} vectors for {len(missing)} texts"
+                )
+
+            stored = _vector_matrix(fresh).astype(EMBEDDING_CACHE_DTYPE)
+            # return what a later cache hit would: same vector for a text
+            # whether or not the cache was warmed first
+            rounded = stored.astype(np.float32)
+
+            # one write transaction for the batch's new vectors
+            with cache.transact():
+                for j, i in enumerate(missing):
+                    cache.set(keys[i], stored[j].tobytes())
+                    vectors[i] = rounded[j]
+
+        if len(missing) < len(texts):
+            logger.debug(f"[EMBED] Cache hits: {len(texts) - len(missing)}/{len(texts)}")
+
+        return vectors
+
+    return cached_embed_fn
+
+
+# ============================================================
+#    L2 NORMALIZATION (collection uses inner-product distance)
+# ============================================================
+
+def _vector_matrix(vectors) -> np.ndarray:
+    """
+    Embedding-function output → one new contiguous (n, dim) float32 array.
+
+    Checks once whether items are Gemini-style objects with `.values`
+    (list or raw float32 bytes) instead of unwrapping each vector.
+    """
+    if len(vectors) and hasattr(vectors[0], "values"):
+        return np.stack([
+            np.frombuffer(v.values, dtype=np.float32)
+            if isinstance(v.values, (bytes, memoryview))
+            else np.asarray(v.values, dtype=np.float32)
+            for v in vectors
+        ])
+    return np.array(vectors, dtype=np.float32)
+
+
+def normalize_vectors(vectors, copy: bool = True) -> np.ndarray:
+    """
+    Scale each vector to unit length so inner product == cosine similarity.
+    Zero vectors are returned unchanged.
+
+    Returns a contiguous (n, dim) float32 array — Chroma takes it as-is,
+    no per-float Python objects. copy=False normalizes a float32 array
+    the caller owns in place.
+    """
+    arr = np.array(vectors, dtype=np.float32) if copy else np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    arr /= norms
+    return arr
+
+
+# ============================================================
+#    BATCHED CHROMA WRITER
+# ============================================================
+
+# Chunks per embedding request + collection.add() call.
+# Chroma recommends 50–250 rows per add; OpenAI accepts lists per request.
+BATCH_SIZE = 128
+
+# Embedding requests in flight at once (bounded to stay under OpenAI rate limits)
+EMBED_WORKERS = 5
+
+# Smallest batch the tail of a document is split into (see store_chunks)
+EMBED_MIN_BATCH = 16
+
+# Embedded batches allowed to wait for collection.add() — backpressure that
+# keeps peak memory at O(workers + queue) batches instead of O(all chunks)
+EMBED_QUEUE_SIZE = 4
+
+
+def _embed_batch(embed_fn, texts: List[str]) -> np.ndarray:
+    """Embed one batch → checked, unit-normalized vectors."""
+    # small jitter so concurrent requests don't hit the API in lockstep
+    time.sleep(random.uniform(0, 0.05))
+
+    vectors = embed_fn(texts)
+
+    if len(vectors) != len(texts):
+        raise ValueError(
+            f"Embedding batch size mismatch: got {len(vectors)} vectors for {len(texts)} texts"
+        )
+
+    return normalize_vectors(_vector_matrix(vectors), copy=False)
+
+
+def store_chunks(
+    collection,
+    chunks: List[Dict[str, Any]],
+    embed_fn=None,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = EMBED_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Embed + add chunks to a Chroma collection, one batch at a time.
+
+    Each batch makes a single embedding call and a single collection.add()
+    with parallel ids/documents/metadatas/embeddings lists. Vectors are
+    unit-normalized before they are stored.
+
+    Pipelined: up to `max_workers` batches are embedded on threads while
+    the calling thread adds finished batches to Chroma in order. At most
+    max_workers + EMBED_QUEUE_SIZE batches are held in memory at once.
+
+    Adaptive batch size: full `batch_size` batches while there is plenty
+    of work; once fewer than max_workers full batches remain, the rest is
+    split evenly across workers (down to EMBED_MIN_BATCH) so small PDFs
+    use every worker instead of one or two large requests.
+
+    on_progress(done, total) is called after every batch (skipped ones too).
+
+    Returns the number of chunks stored (batches with duplicate ids are skipped).
+    """
+    embed_fn = embed_fn or get_embedding_function()
+    embed = functools.partial(_embed_batch, embed_fn)
+
+    total = len(chunks)
+    workers = max(1, max_workers)
+    window = workers + EMBED_QUEUE_SIZE
+    cursor = 0
+    tail_size = None
+    stored = 0
+    done = 0
+
+    logger.info(f"[EMBED] Embedding {total} chunks (batch_size={batch_size}, workers={max_workers})...")
+
+    ex = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+
+        def submit_next() -> bool:
+            nonlocal cursor, tail_size
+            remaining = total - cursor
+            if remaining <= 0:
+                return False
+            if tail_size is None and remaining < workers * batch_size:
+                # split the tail once, evenly across all workers
+                tail_size = max(EMBED_MIN_BATCH, -(-remaining // workers))
+            size = min(batch_size, tail_size or batch_size)
+            start = cursor
+            cursor += size
+            batch = chunks[start:cursor]
+            texts = [c["text"] for c in batch]
+            pending.append((start, batch, texts, ex.submit(embed, texts)))
+            return True
+
+        while len(pending) < window and submit_next():
+            pass
+
+        while pending:
+            start, batch, texts, future = pending.popleft()
+            batch_vectors = future.result()
+            submit_next()
+
+            try:
+                collection.add(
+                    ids=[c["id"] for c in batch],
+                    embeddings=batch_vectors,
+                    documents=texts,
+                    metadatas=[c.get("metadata", {}) for c in batch],
+                )
+                stored += len(batch)
+            except IDAlreadyExistsError as e:
+                logger.warning(f"[CHROMA] Skipping batch {start}–{start + len(batch) - 1}: {e}")
+
+            done += len(batch)
+            if on_progress:
+                on_progress(done, total)
+    finally:
+        # on error, don't keep embedding batches nobody will store
+        ex.shutdown(wait=True, cancel_futures=True)
+
+    return stored
+
+
+def warm_embedding_cache(
+    texts: List[str],
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = EMBED_WORKERS,
+) -> int:
+    """
+    Embed `texts` into the ETL cache ahead of store_chunks(), e.g. while
+    the document's Postgres load (which yields the document_id that Chroma
+    metadata needs) is still running. A later store_chunks() with
+    get_cached_embedding_function() then makes no API calls for them.
+
+    Empty and repeated texts are skipped. Returns the number embedded.
+    """
+    texts = list(dict.fromkeys(t for t in texts if t and not t.isspace()))
+    if not texts:
+        return 0
+
+    embed_fn = get_cached_embedding_function()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    logger.info(f"[EMBED] Prefetching embeddings for {len(texts)} texts ({len(batches)} batches)...")
+
+    if len(batches) == 1:
+        embed_fn(batches[0])
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as ex:
+            # list() re-raises the first failed batch
+            list(ex.map(embed_fn, batches))
+
+    return len(texts)
+
+
 # ============================================================
 #    STORE CHUNKS INTO CHROMADB WITH EMBEDDINGS
 # ============================================================
@@ -49,7 +328,9 @@ def get_embedding_function():
 def store_chunks_in_chroma(
     chunks: List[Dict[str, Any]],
     collection_name: str = "pdf_chunks",
-    batch_size: int = 64,
+    batch_size: int = BATCH_SIZE,
+    bulk_mode: bool = False,
+    on_progress: Optional[Callable[[int, int], None]] = None,
 ):
     """
     Takes chunk list:
@@ -63,7 +344,10 @@ def store_chunks_in_chroma(
     Args:
         chunks: list of chunk dicts from pdf_chunking.chunk_document()
         collection_name: Chroma collection name
-        batch_size: number of texts per embedding call
+        batch_size: number of chunks per embedding call / Chroma add
+        bulk_mode: relax Chroma's SQLite durability while adding
+                   (one-shot/re-runnable ingestion only, see bulk_ingest())
+        on_progress: optional callback(done, total) after each batch
     """
 
     if not chunks:
@@ -71,50 +355,20 @@ def store_chunks_in_chroma(
         return {"stored": 0, "collection": collection_name}
 
     collection = get_collection(collection_name)
-    embed_fn = get_embedding_function()
-
-    ids = [c["id"] for c in chunks]
-    texts = [c["text"] for c in chunks]
-    metadatas = [c.get("metadata", {}) for c in chunks]
-
-    logger.info(f"[EMBED] Creating embeddings for {len(chunks)} chunks (batch_size={batch_size})...")
-
-    all_vectors: List[List[float]] = []
-    total = len(texts)
-
-    # ---- Batched embedding to avoid rate/time issues ----
-    for start in range(0, total, batch_size):
-        end = min(start + batch_size, total)
-        batch_texts = texts[start:end]
-        batch_ids = ids[start:end]
 
-        logger.info(f"[EMBED] Embedding batch {start}–{end - 1} (size={len(batch_texts)})...")
-        batch_vectors = embed_fn(batch_texts)
+    logger.info(f"[EMBED] Embedding + storing {len(chunks)} chunks (batch_size={batch_size})...")
 
-        if len(batch_vectors) != len(batch_texts):
-            raise ValueError(
-                f"Embedding batch size mismatch: got {len(batch_vectors)} vectors for "
-                f"{len(batch_texts)} texts (ids {batch_ids[0]}..{batch_ids[-1]})"
-            )
-
-        all_vectors.extend(batch_vectors)
-
-    logger.success(f"[EMBED] Generated {len(all_vectors)} embeddings.")
-
-    # ---- Store in Chroma ----
-    collection.add(
-        ids=ids,
-        embeddings=all_vectors,
-        documents=texts,
-        metadatas=metadatas,
-    )
+    if bulk_mode:
+        with bulk_ingest():
+            stored = store_chunks(collection, chunks, batch_size=batch_size, on_progress=on_progress)
+    else:
+        stored = store_chunks(collection, chunks, batch_size=batch_size, on_progress=on_progress)
 
     logger.success(
-        f"[CHROMA] Stored {len(chunks)} chunks in ChromaDB collection: {collection_name}"
+        f"[CHROMA] Stored {stored} chunks in ChromaDB collection: {collection_name}"
     )
 
     return {
-        "stored": len(chunks),
+        "stored": stored,
         "collection": collection_name,
     }
-
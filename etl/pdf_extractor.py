@@ -1,28 +1,44 @@
 import os
+import re
 import sys
-import json
+import asyncio
+import multiprocessing
+import orjson
+from string import Template
+from collections import deque
+from itertools import chain, islice
+from typing import Iterable, Iterator
 from textwrap import shorten
 from loguru import logger
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
 import pdfplumber
 
-from etl.llm_client import ask_llm
+from etl.llm_client import ask_llm_cached, ask_llm_many
+# single-pass table → markdown serializer, shared with the chunker
+from etl.pdf_chunking import table_to_markdown
 from etl.prompts import (
     CONSTRUCTION_PROCESS_PROMPT,
     PROJECT_SCHEDULE_PROMPT,
     REGULATORY_RULES_PROMPT,
     COSTING_EXTRACTION_PAGE_PROMPT,
+    MULTI_PAGE_INSTRUCTIONS,
 )
 
 # ----------------- CONCURRENCY LIMITS -----------------
 # Max PDFs processed in parallel
 MAX_DOC_WORKERS = 4
-# Max pages (LLM calls) per PDF in parallel
-MAX_PAGE_WORKERS = 4
+# Processes for pdfplumber page extraction (CPU-bound, GIL-limited)
+MAX_EXTRACT_WORKERS = os.cpu_count() or 1
+# Pages per extraction task (bounds pages held in memory at once)
+EXTRACT_RANGE_PAGES = 16
+# Max in-flight page LLM calls per PDF (asyncio, network-bound)
+MAX_PAGE_CONCURRENCY = 32
+# Pages sent per LLM call for instruction-only prompts (costing stays 1/page)
+PAGES_PER_PROMPT = 4
 
 PROMPT_MAP = {
     "construction_process": CONSTRUCTION_PROCESS_PROMPT,
@@ -32,48 +48,50 @@ PROMPT_MAP = {
 }
 
 
-# --------------------------------------------------------------------
-# Helper: serialize a pdfplumber table into markdown-like text
-# --------------------------------------------------------------------
-def table_to_markdown(table: list[list[str]]) -> str:
+def _compile_page_template(prompt: str) -> Template:
     """
-    Convert a single pdfplumber table (list of rows) into a markdown-ish string.
-    We keep the first non-empty row as header.
+    {{PAGE_NUMBER}} / {{PAGE_TEXT}} / {{PAGE_TABLES}} prompt → string.Template,
+    so each page is filled in one substitution pass. Literal "$" is escaped.
     """
-    if not table:
-        return ""
+    return Template(
+        prompt
+        .replace("$", "$$")
+        .replace("{{PAGE_NUMBER}}", "${page_number}")
+        .replace("{{PAGE_TEXT}}", "${page_text}")
+        .replace("{{PAGE_TABLES}}", "${page_tables}")
+    )
 
-    # Clean cells
-    cleaned = []
-    for row in table:
-        cleaned.append([(cell or "").replace("\n", " ").strip() for cell in row])
 
-    # find first non-empty row as header
-    header_idx = 0
-    for idx, row in enumerate(cleaned):
-        if any(cell for cell in row):
-            header_idx = idx
-            break
+# Max characters of page text sent to the LLM
+PAGE_TEXT_MAX_CHARS = 6000
 
-    header = cleaned[header_idx]
-    body = cleaned[header_idx + 1 :]
+# C-level scan for "page has any digit" (costing page filter)
+_HAS_DIGIT = re.compile(r"\d").search
 
-    # Build markdown
-    # Ensure all rows have same length
-    max_cols = max(len(r) for r in cleaned)
-    norm = lambda r: r + [""] * (max_cols - len(r))
 
-    header = norm(header)
-    body = [norm(r) for r in body]
-
-    lines = []
-    lines.append("| " + " | ".join(header) + " |")
-    lines.append("| " + " | ".join(["---"] * len(header)) + " |")
+# Prompts with per-page placeholders, compiled once at import.
+# Types not listed here are "instruction only" (page content is appended).
+PAGE_TEMPLATES = {
+    "construction_costing": _compile_page_template(COSTING_EXTRACTION_PAGE_PROMPT),
+}
 
-    for row in body:
-        lines.append("| " + " | ".join(row) + " |")
 
-    return "\n".join(lines)
+# --------------------------------------------------------------------
+# Helper: text + markdown tables from a single pdfplumber page
+# --------------------------------------------------------------------
+def _has_grid(page) -> bool:
+    """True if the page has >= 2 horizontal and >= 2 vertical edges."""
+    h = v = 0
+    for edge in page.edges:
+        orientation = edge["orientation"]
+        if orientation == "h":
+            h += 1
+        elif orientation == "v":
+            # curve edges (orientation None) never form table cells
+            v += 1
+        if h >= 2 and v >= 2:
+            return True
+    return False
 
 
 def extract_page_content(page, page_number: int) -> dict:
@@ -81,16 +99,17 @@ def extract_page_content(page, page_number: int) -> dict:
     Extract text + tables from a single pdfplumber page.
     Returns dict with 'text' and 'tables_markdown'.
     """
-    text = page.extract_text() or ""
-    text = text.strip()
+    raw = page.extract_text() or ""
 
-    # limit raw text length to save tokens
-    if len(text) > 6000:
-        text = text[:6000]
+    # limit raw text length to save tokens — slice first so strip()
+    # never copies the full text of dense pages
+    text = raw.lstrip()[:PAGE_TEXT_MAX_CHARS].rstrip()
 
-    # tables
+    # tables — pdfplumber's default "lines" strategy needs at least two
+    # horizontal and two vertical rulings to form a cell, so skip the
+    # expensive detection on pages without a grid (most prose pages)
     try:
-        tables = page.extract_tables() or []
+        tables = (page.extract_tables() or []) if _has_grid(page) else []
     except Exception as e:
         logger.warning(f"[PDF] Table extraction failed on page {page_number}: {e}")
         tables = []
@@ -110,90 +129,177 @@ def extract_page_content(page, page_number: int) -> dict:
     }
 
 
+# --------------------------------------------------------------------
+# Page extraction (page ranges in worker processes, streamed)
+# --------------------------------------------------------------------
+def _iter_range(pdf_path: str, start: int, end: int) -> Iterator[dict]:
+    """
+    Yield extracted pages [start, end) (0-based) from one pdfplumber handle.
+    Each page's parsed layout is released once it has been extracted.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        num_pages = len(pdf.pages)
+        for i in range(start, end):
+            logger.info(f"[PAGE] Reading page {i + 1}/{num_pages}")
+            page = pdf.pages[i]
+            yield extract_page_content(page, i + 1)
+            page.close()
+
+
+def _extract_range(pdf_path: str, start: int, end: int) -> list[dict]:
+    """
+    Extract pages [start, end) (0-based) — runs in a worker process,
+    which opens its own pdfplumber handle.
+    """
+    return list(_iter_range(pdf_path, start, end))
+
+
+def extract_pages(pdf_path: str) -> Iterator[dict]:
+    """
+    Yield text + tables for every page, in page order.
+
+    Pages are extracted in ranges of up to EXTRACT_RANGE_PAGES across worker
+    processes, with at most 2 ranges per worker in flight — so only a
+    bounded number of extracted pages is held before the caller consumes
+    them (single worker → in-process, page by page).
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        num_pages = len(pdf.pages)
+    logger.info(f"[PROCESS] Total pages: {num_pages}")
+
+    workers = min(MAX_EXTRACT_WORKERS, num_pages)
+    if workers <= 1:
+        yield from _iter_range(pdf_path, 0, num_pages)
+        return
+
+    step = min(-(-num_pages // workers), EXTRACT_RANGE_PAGES)  # ceil division
+    ranges = iter([(s, min(s + step, num_pages)) for s in range(0, num_pages, step)])
+
+    logger.info(f"[PROCESS] Extracting {num_pages} pages with {workers} processes.")
+    # spawn, not fork: runs on a Prefect task thread (task_2_extract) while
+    # other threads may hold loguru/logging locks a forked child would inherit
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        pending = deque(
+            executor.submit(_extract_range, pdf_path, s, e)
+            for s, e in islice(ranges, 2 * workers)
+        )
+        while pending:
+            pages = pending.popleft().result()
+            for s, e in islice(ranges, 1):
+                pending.append(executor.submit(_extract_range, pdf_path, s, e))
+            yield from pages
+
+
 # --------------------------------------------------------------------
 # Safe JSON loader for LLM responses
 # --------------------------------------------------------------------
+# leading ```json / trailing ``` code fences
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def _outermost_array(s: str) -> str | None:
+    """
+    Single scan for the first top-level JSON array in `s`, matching
+    brackets outside of string literals. Returns None if unbalanced.
+    """
+    start = s.find("[")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        c = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+            if depth == 0:
+                return s[start : i + 1]
+
+    return None
+
+
 def safe_json_loads(raw):
     """
     Try to parse JSON from an LLM response.
-    Strips code fences and trailing text if needed.
+    Strips code fences and surrounding text if needed.
     """
     if isinstance(raw, dict) or isinstance(raw, list):
         return raw
 
-    s = str(raw).strip()
-
-    # strip common ```json ... ``` wrappers
-    if s.startswith("```"):
-        # remove leading/trailing backticks
-        s = s.strip("`")
-        # after stripping backticks, sometimes 'json\n[ ... ]'
-        if s.lower().startswith("json"):
-            s = s[4:].lstrip()
+    s = _FENCE_RE.sub("", str(raw).strip())
 
     # try direct parse
     try:
-        return json.loads(s)
-    except Exception:
-        # heuristic: keep only substring from first '[' to last ']'
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:
+        pass
+
+    # fallback: outermost [...] array inside surrounding prose
+    snippet = _outermost_array(s)
+    if snippet is not None:
         try:
-            start = s.index("[")
-            end = s.rindex("]")
-            snippet = s[start : end + 1]
-            return json.loads(snippet)
-        except Exception as e:
+            return orjson.loads(snippet)
+        except orjson.JSONDecodeError as e:
             logger.error(f"[JSON] Failed to parse LLM JSON: {e}")
             return []
 
+    logger.error("[JSON] Failed to parse LLM JSON: no JSON array found")
+    return []
+
 
 # --------------------------------------------------------------------
-# Single-page LLM worker (used in thread pool)
+# Single-page prompt builder / result parser
 # --------------------------------------------------------------------
-def _process_page_with_llm(
-    pdf_type: str,
-    prompt_template: str,
-    page_info: dict,
-):
-    """
-    Build prompt for a single page, call LLM, parse JSON.
-    Returns (page_number, list_of_items).
-    """
-    page_number = page_info["page_number"]
-    text = page_info["text"]
-    tables_md = page_info["tables_markdown"]
-
-    # ------------- build LLM prompt -------------
-    if pdf_type == "construction_costing":
-        # COSTING_EXTRACTION_PAGE_PROMPT is assumed to have
+def _build_page_prompt(pdf_type: str, prompt_template: str, page_info: dict) -> str:
+    """Build the LLM prompt for a single page."""
+    page_template = PAGE_TEMPLATES.get(pdf_type)
+    if page_template is not None:
+        # e.g. COSTING_EXTRACTION_PAGE_PROMPT with
         # {{PAGE_NUMBER}}, {{PAGE_TEXT}}, {{PAGE_TABLES}} placeholders
-        prompt = (
-            prompt_template
-            .replace("{{PAGE_NUMBER}}", str(page_number))
-            .replace("{{PAGE_TEXT}}", text)
-            .replace("{{PAGE_TABLES}}", tables_md)
+        return page_template.substitute(
+            page_number=page_info["page_number"],
+            page_text=page_info["text"],
+            page_tables=page_info["tables_markdown"],
         )
-    else:
-        # For other types, prompts are "instruction only".
-        # We append the actual page content at the end.
-        content_blocks = [f"Page number: {page_number}"]
-        if text:
-            content_blocks.append("PAGE TEXT:\n" + text)
-        if tables_md:
-            content_blocks.append("PAGE TABLES (markdown):\n" + tables_md)
 
-        page_block = "\n\n".join(content_blocks)
+    # For other types, prompts are "instruction only".
+    # We append the actual page content at the end.
+    return prompt_template.strip() + "\n\n" + _page_block(page_info)
+
 
-        prompt = prompt_template.strip() + "\n\n" + page_block
+def _page_block(page_info: dict) -> str:
+    """Page number + text + tables, as appended to instruction-only prompts."""
+    content_blocks = [f"Page number: {page_info['page_number']}"]
+    if page_info["text"]:
+        content_blocks.append("PAGE TEXT:\n" + page_info["text"])
+    if page_info["tables_markdown"]:
+        content_blocks.append("PAGE TABLES (markdown):\n" + page_info["tables_markdown"])
 
-    # ------------- call LLM -------------
-    logger.info(f"[LLM] Extracting data from page {page_number} ({pdf_type})...")
-    llm_raw = ask_llm(prompt)
+    return "\n\n".join(content_blocks)
 
+
+def _parse_page_results(pdf_type: str, page_number: int, llm_raw) -> list:
+    """Parse one page's LLM output into a list of items."""
     page_results = safe_json_loads(llm_raw)
 
     if not isinstance(page_results, list):
         logger.warning(f"[LLM] Non-list JSON for page {page_number}, skipping.")
-        return page_number, []
+        return []
 
     # For non-costing types, tag page_number if not present
     if pdf_type in ("construction_process", "project_schedule", "ura_circular"):
@@ -207,11 +313,159 @@ def _process_page_with_llm(
                 tagged.append(obj)
         page_results = tagged
 
-    return page_number, page_results
+    return page_results
 
 
 # --------------------------------------------------------------------
-# Main per-PDF processor (now supports all pdf_types) + page-level parallel
+# Page batches (several pages per LLM call)
+# --------------------------------------------------------------------
+def _page_batches(pdf_type: str, pages: Iterable[dict]) -> Iterator[list[dict]]:
+    """
+    Group pages into per-call batches (lazily). Costing prompts are per page
+    (their JSON contract is already keyed by page); the instruction-only
+    prompts take up to PAGES_PER_PROMPT pages at once.
+    """
+    size = 1 if pdf_type == "construction_costing" else PAGES_PER_PROMPT
+    pages = iter(pages)
+    while batch := list(islice(pages, size)):
+        yield batch
+
+
+def _build_batch_prompt(pdf_type: str, prompt_template: str, page_infos: list[dict]) -> str:
+    """Prompt for a page batch; a batch of one uses the single-page prompt."""
+    if len(page_infos) == 1:
+        return _build_page_prompt(pdf_type, prompt_template, page_infos[0])
+
+    pages_block = "\n\n".join(
+        f"===PAGE {p['page_number']}===\n" + _page_block(p) for p in page_infos
+    )
+    return (
+        prompt_template.strip()
+        + "\n\n" + MULTI_PAGE_INSTRUCTIONS.strip()
+        + "\n\n" + pages_block
+    )
+
+
+def _parse_batch_results(pdf_type: str, page_infos: list[dict], llm_raw) -> list:
+    """
+    Parse a page batch's LLM output → the batch's items, in page order.
+    Pages missing from the response contribute nothing.
+    """
+    if len(page_infos) == 1:
+        page_number = page_infos[0]["page_number"]
+        return _parse_page_results(pdf_type, page_number, llm_raw)
+
+    # page_number → slot in page order
+    slot_of = {p["page_number"]: idx for idx, p in enumerate(page_infos)}
+    results_by_slot = [[] for _ in page_infos]
+
+    parsed = safe_json_loads(llm_raw)
+    if not isinstance(parsed, list):
+        logger.warning(f"[LLM] Non-list JSON for pages {list(slot_of)}, skipping.")
+        return []
+
+    seen = set()
+    for obj in parsed:
+        if not isinstance(obj, dict):
+            logger.warning(f"[LLM] Unexpected page object in batch response: {shorten(str(obj), 120)}")
+            continue
+
+        # models sometimes echo the page number as "3" or 3.0
+        try:
+            page_number = int(obj.get("page_number"))
+        except (TypeError, ValueError):
+            page_number = None
+
+        if page_number not in slot_of:
+            logger.warning(f"[LLM] Unexpected page object in batch response: {shorten(str(obj), 120)}")
+            continue
+
+        seen.add(page_number)
+        results_by_slot[slot_of[page_number]] = _parse_page_results(
+            pdf_type, page_number, obj.get("items") or []
+        )
+
+    missing = [n for n in slot_of if n not in seen]
+    if missing:
+        logger.warning(f"[LLM] Pages {missing} missing from batch response, no items extracted.")
+
+    return list(chain.from_iterable(results_by_slot))
+
+
+def _process_page_batch_with_llm(
+    pdf_type: str,
+    prompt_template: str,
+    page_infos: list[dict],
+) -> list:
+    """
+    Build prompt for a page batch, call LLM, parse JSON.
+    Returns the batch's items in page order.
+    """
+    prompt = _build_batch_prompt(pdf_type, prompt_template, page_infos)
+
+    page_numbers = [p["page_number"] for p in page_infos]
+    logger.info(f"[LLM] Extracting data from pages {page_numbers} ({pdf_type})...")
+    llm_raw = ask_llm_cached(prompt)
+
+    return _parse_batch_results(pdf_type, page_infos, llm_raw)
+
+
+def _process_page_batches_with_llm(
+    pdf_type: str,
+    prompt_template: str,
+    batches: list[list[dict]],
+) -> list[list]:
+    """
+    All batches' LLM calls concurrently (asyncio, up to MAX_PAGE_CONCURRENCY
+    in flight). Returns one item list per batch, in batch order; failed
+    batches → [].
+    """
+    prompts = [_build_batch_prompt(pdf_type, prompt_template, b) for b in batches]
+    raw_outputs = asyncio.run(
+        ask_llm_many(
+            prompts,
+            max_concurrency=MAX_PAGE_CONCURRENCY,
+            return_exceptions=True,
+            cached=True,
+        )
+    )
+
+    results = [None] * len(batches)
+    for idx, (page_infos, raw) in enumerate(zip(batches, raw_outputs)):
+        if isinstance(raw, Exception):
+            page_numbers = [p["page_number"] for p in page_infos]
+            logger.error(f"[PROCESS] Pages {page_numbers} failed: {raw}")
+            results[idx] = []
+        else:
+            results[idx] = _parse_batch_results(pdf_type, page_infos, raw)
+
+    return results
+
+
+# --------------------------------------------------------------------
+# Page filter (skip pages not worth an LLM call)
+# --------------------------------------------------------------------
+def _keep_page(page_info: dict, pdf_type: str) -> bool:
+    page_index = page_info["page_number"]
+    text = page_info["text"]
+    tables_md = page_info["tables_markdown"]
+
+    # skip empty pages
+    if not text and not tables_md:
+        logger.info(f"[PAGE] Page {page_index}: empty text & tables, skipping.")
+        return False
+
+    # For costing PDFs, skip pages with no digits at all to save tokens
+    if pdf_type == "construction_costing":
+        if not (_HAS_DIGIT(text) or _HAS_DIGIT(tables_md)):
+            logger.info(f"[PAGE] Page {page_index}: no digits, skipping (costing).")
+            return False
+
+    return True
+
+
+# --------------------------------------------------------------------
+# Main per-PDF processor (now supports all pdf_types) + page-level async
 # --------------------------------------------------------------------
 def process_single_pdf(pdf_path: str, classifier: dict) -> dict:
     pdf_type = classifier["pdf_type"]
@@ -222,77 +476,42 @@ def process_single_pdf(pdf_path: str, classifier: dict) -> dict:
 
     prompt_template = PROMPT_MAP[pdf_type]
 
-    # -------- First: extract all pages (sequential pdfplumber) --------
-    pages_to_process = []
-    with pdfplumber.open(pdf_path) as pdf:
-        num_pages = len(pdf.pages)
-        logger.info(f"[PROCESS] Total pages: {num_pages}")
-
-        for page_index, page in enumerate(pdf.pages, start=1):
-            logger.info(f"[PAGE] Reading page {page_index}/{num_pages}")
-            page_info = extract_page_content(page, page_index)
-            text = page_info["text"]
-            tables_md = page_info["tables_markdown"]
+    # -------- First: stream extracted pages, dropping skippable ones --------
+    pages = (p for p in extract_pages(pdf_path) if _keep_page(p, pdf_type))
 
-            # skip empty pages
-            if not text and not tables_md:
-                logger.info(f"[PAGE] Page {page_index}: empty text & tables, skipping.")
-                continue
+    # -------- Second: call LLM per page batch, one window at a time --------
+    # A window is up to MAX_PAGE_CONCURRENCY batches, so only that many
+    # pages' text is held while their LLM calls are in flight.
+    batches = _page_batches(pdf_type, pages)
+    structured = []
+    num_pages = 0
 
-            # For costing PDFs, skip pages with no digits at all to save tokens
-            if pdf_type == "construction_costing":
-                if not any(c.isdigit() for c in (text + tables_md)):
-                    logger.info(f"[PAGE] Page {page_index}: no digits, skipping (costing).")
-                    continue
+    while window := list(islice(batches, MAX_PAGE_CONCURRENCY)):
+        window_pages = sum(len(b) for b in window)
+        num_pages += window_pages
 
-            pages_to_process.append(page_info)
-
-    if not pages_to_process:
-        logger.warning("[PROCESS] No pages selected for LLM processing.")
-        structured = []
-    else:
-        # -------- Second: call LLM per page (possibly in parallel) --------
-        all_results_by_page = {}
-
-        if len(pages_to_process) == 1:
-            # single page → no multithreading
-            page_number, items = _process_page_with_llm(
-                pdf_type,
-                prompt_template,
-                pages_to_process[0],
+        if len(window) == 1:
+            # single call → no async fan-out
+            structured.extend(
+                _process_page_batch_with_llm(pdf_type, prompt_template, window[0])
             )
-            all_results_by_page[page_number] = items
         else:
-            # multiple pages → limited parallelism
-            workers = min(MAX_PAGE_WORKERS, len(pages_to_process))
+            # multiple calls → concurrent async LLM calls
             logger.info(
-                f"[PROCESS] Starting page-level thread pool with {workers} workers "
-                f"for {len(pages_to_process)} pages."
+                f"[PROCESS] Sending {window_pages} pages to the LLM in "
+                f"{len(window)} calls (max {MAX_PAGE_CONCURRENCY} in flight)."
+            )
+            results_by_batch = _process_page_batches_with_llm(
+                pdf_type,
+                prompt_template,
+                window,
             )
-            with ThreadPoolExecutor(max_workers=workers) as executor:
-                future_to_page = {
-                    executor.submit(
-                        _process_page_with_llm,
-                        pdf_type,
-                        prompt_template,
-                        page_info,
-                    ): page_info["page_number"]
-                    for page_info in pages_to_process
-                }
-
-                for future in as_completed(future_to_page):
-                    page_number = future_to_page[future]
-                    try:
-                        pn, items = future.result()
-                        all_results_by_page[pn] = items
-                    except Exception as e:
-                        logger.error(f"[PROCESS] Page {page_number} failed in thread: {e}")
-                        all_results_by_page.setdefault(page_number, [])
-
-        # flatten in page order
-        structured = []
-        for pn in sorted(all_results_by_page.keys()):
-            structured.extend(all_results_by_page[pn])
+
+            # batches are already in page order → flatten, no sort
+            structured.extend(chain.from_iterable(results_by_batch))
+
+    if not num_pages:
+        logger.warning("[PROCESS] No pages selected for LLM processing.")
 
     return {
         "filename": os.path.basename(pdf_path),
@@ -305,32 +524,46 @@ def process_single_pdf(pdf_path: str, classifier: dict) -> dict:
 # --------------------------------------------------------------------
 # Multi-PDF processor (document-level parallelism)
 # --------------------------------------------------------------------
+def _init_doc_worker(extract_workers: int):
+    """
+    Doc-worker process initializer: share the cores between documents
+    so each worker's page-extraction pool doesn't oversubscribe the CPU.
+    """
+    global MAX_EXTRACT_WORKERS
+    MAX_EXTRACT_WORKERS = extract_workers
+
+
 def process_many_pdfs(pdf_paths: list[str]) -> list[dict]:
     """
     Process multiple PDFs. If only 1 → sequential.
-    If 2+ → parallel up to MAX_DOC_WORKERS.
+    If 2+ → parallel up to MAX_DOC_WORKERS processes (pdfplumber and JSON
+    parsing are GIL-bound, so threads would serialize).
     """
-    from etl.pdf_classifier import detect_pdf_type
+    from etl.pdf_classifier import detect_pdf_types
 
-    jobs = []
-    for path in pdf_paths:
-        logger.info(f"[CLASSIFY] Detecting type for: {path}")
-        classifier = detect_pdf_type(path)
-        jobs.append((path, classifier))
+    logger.info(f"[CLASSIFY] Detecting types for {len(pdf_paths)} PDFs")
+    classifiers = detect_pdf_types(pdf_paths)
+    jobs = list(zip(pdf_paths, classifiers))
 
     results = []
 
     if len(jobs) == 1:
-        # single document → no doc-level multithreading
+        # single document → no doc-level parallelism
         path, classifier = jobs[0]
         results.append(process_single_pdf(path, classifier))
     else:
         workers = min(MAX_DOC_WORKERS, len(jobs))
         logger.info(
-            f"[MULTI] Starting doc-level thread pool with {workers} workers "
+            f"[MULTI] Starting doc-level process pool with {workers} workers "
             f"for {len(jobs)} PDFs."
         )
-        with ThreadPoolExecutor(max_workers=workers) as executor:
+        # spawn: don't fork the parent's open HTTP/DB connections into workers
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_doc_worker,
+            initargs=(max(1, MAX_EXTRACT_WORKERS // workers),),
+        ) as executor:
             future_to_path = {
                 executor.submit(process_single_pdf, path, classifier): path
                 for (path, classifier) in jobs
@@ -345,3 +578,21 @@ def process_many_pdfs(pdf_paths: list[str]) -> list[dict]:
                     logger.error(f"[MULTI] Failed to process {path}: {e}")
 
     return results
+
+
+# --------------------------------------------------------------------
+# CLI: python etl/pdf_extractor.py a.pdf [b.pdf ...]
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python etl/pdf_extractor.py <pdf> [<pdf> ...]")
+
+    for result in process_many_pdfs(sys.argv[1:]):
+        out_name = os.path.splitext(result["filename"])[0] + "_structured.json"
+        with open(out_name, "wb") as f:
+            f.write(orjson.dumps(result["structured_data"], option=orjson.OPT_INDENT_2))
+
+        logger.success(
+            f"[CLI] {result['filename']} ({result['pdf_type']}) → "
+            f"{len(result['structured_data'])} items written to {out_name}"
+        )
@@ -1,8 +1,27 @@
-import psycopg
+from psycopg.conninfo import make_conninfo
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 from loguru import logger
 from etl.config import settings   
 
+# Child tables → record keys copied after document_id, in column order
+CHILD_COLUMNS = {
+    "project_tasks": ("task_name", "duration_days", "start_date", "finish_date"),
+    "cost_items": ("item_name", "quantity", "unit_price_yen", "total_cost_yen", "cost_type"),
+    "regulatory_rules": ("rule_summary", "measurement_basis"),
+}
+
+INSERT_DOCUMENT_SQL = """
+INSERT INTO documents_master (document_name, document_type)
+VALUES (%s, %s)
+RETURNING document_id;
+"""
+
+# Pool size: one connection per concurrently processed PDF
+# (pdf_extractor.MAX_DOC_WORKERS)
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 4
+
 
 class PostgresClient:
     def __init__(
@@ -21,15 +40,40 @@ class PostgresClient:
             "password": password or settings.PG_PASSWORD
         }
 
+        # Connections stay open across insert_* calls instead of paying
+        # TCP/TLS + auth on every call
+        self.pool = ConnectionPool(
+            conninfo=make_conninfo(**{k: v for k, v in self.conn_params.items() if v is not None}),
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            kwargs={"row_factory": dict_row},
+            open=True,
+        )
+
         logger.info(f"Initialized Postgres client for DB={self.conn_params['dbname']}")
 
     def get_conn(self):
-        """Return a fresh psycopg connection."""
-        try:
-            return psycopg.connect(**self.conn_params, row_factory=dict_row)
-        except Exception as e:
-            logger.error(f"Failed to connect to PostgreSQL: {e}")
-            raise
+        """
+        Borrow a pooled psycopg connection (use as a context manager;
+        it is returned to the pool on exit).
+        """
+        return self.pool.connection()
+
+    def close(self):
+        """Close all pooled connections."""
+        self.pool.close()
+
+    @staticmethod
+    def _copy_rows(cur, table, columns, rows):
+        """
+        Stream rows into `table` with COPY ... FROM STDIN (one protocol
+        stream instead of one INSERT per row). Text format, so Postgres
+        casts loosely-typed LLM values (e.g. date strings) itself.
+        """
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        with cur.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
 
     def create_tables(self):
         ddl_statements = [
@@ -81,16 +125,22 @@ class PostgresClient:
 
         logger.success("All PostgreSQL tables created successfully")
 
-    def insert_document(self, document_name, document_type):
-        sql = """
-        INSERT INTO documents_master (document_name, document_type)
-        VALUES (%s, %s)
-        RETURNING document_id;
-        """
+    def _copy_children(self, cur, table, document_id, records):
+        """COPY `records` (LLM dicts) into a child table for one document."""
+        keys = CHILD_COLUMNS[table]
+        rows = [(document_id, *(r.get(k) for k in keys)) for r in records]
+        self._copy_rows(cur, table, ("document_id", *keys), rows)
+
+    def _insert_children(self, table, document_id, records):
+        with self.get_conn() as conn:
+            with conn.cursor() as cur:
+                self._copy_children(cur, table, document_id, records)
+                conn.commit()
 
+    def insert_document(self, document_name, document_type):
         with self.get_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute(sql, (document_name, document_type))
+                cur.execute(INSERT_DOCUMENT_SQL, (document_name, document_type))
                 row = cur.fetchone()
                 document_id = row["document_id"]
                 conn.commit()
@@ -99,69 +149,38 @@ class PostgresClient:
         return document_id
 
     def insert_project_tasks(self, document_id, records):
-        sql = """
-        INSERT INTO project_tasks (document_id, task_name, duration_days, start_date, finish_date)
-        VALUES (%s, %s, %s, %s, %s);
-        """
-
-        clean_records = []
-        for r in records:
-            clean_records.append((
-                document_id,
-                r.get("task_name"),
-                r.get("duration_days"),
-                r.get("start_date"),
-                r.get("finish_date")
-            ))
-
-        with self.get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.executemany(sql, clean_records)
-                conn.commit()
-
+        self._insert_children("project_tasks", document_id, records)
         logger.success(f"Inserted {len(records)} project tasks")
 
     def insert_cost_items(self, document_id, records):
-        sql = """
-        INSERT INTO cost_items (document_id, item_name, quantity, unit_price_yen, total_cost_yen, cost_type)
-        VALUES (%s, %s, %s, %s, %s, %s);
-        """
-
-        clean_records = []
-        for r in records:
-            clean_records.append((
-                document_id,
-                r.get("item_name"),
-                r.get("quantity"),
-                r.get("unit_price_yen"),
-                r.get("total_cost_yen"),
-                r.get("cost_type"),
-            ))
-
-        with self.get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.executemany(sql, clean_records)
-                conn.commit()
-
+        self._insert_children("cost_items", document_id, records)
         logger.success(f"Inserted {len(records)} cost items")
 
     def insert_regulatory_rules(self, document_id, records):
-        sql = """
-        INSERT INTO regulatory_rules (document_id, rule_summary, measurement_basis)
-        VALUES (%s, %s, %s);
-        """
-
-        clean_records = []
-        for r in records:
-            clean_records.append((
-                document_id,
-                r.get("rule_summary"),
-                r.get("measurement_basis")
-            ))
+        self._insert_children("regulatory_rules", document_id, records)
+        logger.success(f"Inserted {len(records)} regulatory rules")
 
+    def insert_pdf_results(self, document_name, document_type, tasks=(), costs=(), rules=()):
+        """
+        Master row + all child rows on one connection in ONE transaction
+        (single commit/fsync; nothing is left half-written on failure).
+        Returns the new document_id.
+        """
         with self.get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.executemany(sql, clean_records)
-                conn.commit()
-
-        logger.success(f"Inserted {len(records)} regulatory rules")
+            with conn.transaction(), conn.cursor() as cur:
+                cur.execute(INSERT_DOCUMENT_SQL, (document_name, document_type))
+                document_id = cur.fetchone()["document_id"]
+
+                for table, records in (
+                    ("project_tasks", tasks),
+                    ("cost_items", costs),
+                    ("regulatory_rules", rules),
+                ):
+                    if records:
+                        self._copy_children(cur, table, document_id, records)
+
+        logger.success(
+            f"Inserted document '{document_name}' → id={document_id} "
+            f"({len(tasks)} tasks, {len(costs)} cost items, {len(rules)} rules)"
+        )
+        return document_id
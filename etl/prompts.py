@@ -276,3 +276,20 @@ Rules:
 - Ignore headers, footers, page numbers, and IDs unless they contain a rule.
 - Do NOT output anything except valid JSON.
 """
+
+
+# 5. Multi-page wrapper (appended to prompts 1, 3, 4 when several pages
+#    are sent in a single LLM call)
+MULTI_PAGE_INSTRUCTIONS = """
+You will receive SEVERAL pages. Each page starts with a line "===PAGE <n>===".
+Apply the instructions above to each page separately.
+
+Output:
+Return ONLY a JSON array with one object per page (no explanation, no markdown):
+
+[
+  {"page_number": <n>, "items": [ ...JSON array for that page, as specified above... ]}
+]
+
+Use an empty "items" list for pages with nothing to extract.
+"""
@@ -3,150 +3,255 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
 import json
+import time
 import uuid
+import threading
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 import dlt
-from datetime import datetime
+from dlt.destinations.exceptions import DatabaseTerminalException, DatabaseUndefinedRelation
 from loguru import logger
 
 from etl.chroma_client import get_collection
-from etl.pdf_embedding import get_embedding_function
+from etl.pdf_embedding import get_cached_embedding_function, store_chunks, warm_embedding_cache
 
 
 # ================================================================
 # 1. CREATE DLT PIPELINE
 # ================================================================
+# dlt's postgres destination loads "csv" packages with COPY ... FROM STDIN
+# (one stream per table) instead of the default multi-row INSERT VALUES.
+# Applies to every table and size — large cost_items loads need no separate
+# copy path, and dlt still evolves the schema (e.g. new columns) as before.
+LOADER_FILE_FORMAT = "csv"
+
+# dlt Pipeline objects are not thread-safe → one per worker thread
+_local = threading.local()
+
+
 def get_dlt_pipeline():
-    return dlt.pipeline(
-        pipeline_name="pdf_ingestion_pipeline",
-        destination="postgres",
-        dataset_name="pdf_dataset"
-    )
+    """Created once per thread and reused for every document it loads."""
+    pipeline = getattr(_local, "pipeline", None)
+    if pipeline is None:
+        pipeline = _local.pipeline = dlt.pipeline(
+            pipeline_name="pdf_ingestion_pipeline",
+            destination="postgres",
+            dataset_name="pdf_dataset"
+        )
+    return pipeline
 
 
 # ================================================================
-# 2. INSERT INTO documents_master
+# 2. documents_master ROW
 # ================================================================
-def load_document_record(pipeline, pdf_name, pdf_type):
-    logger.info(f"[DLT] Inserting → documents_master ({pdf_name})")
+def _utc_now_iso():
+    """UTC now as 'YYYY-MM-DDTHH:MM:SS.ffffff' (no datetime objects)."""
+    secs, ns = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(secs))}.{ns // 1000:06d}"
 
-    rows = [{
+
+def document_record(pdf_name, pdf_type, pdf_hash=None):
+    return [{
         "pdf_name": pdf_name,
         "pdf_type": pdf_type,
-        "created_at": datetime.utcnow().isoformat()
+        "pdf_hash": pdf_hash,
+        "created_at": _utc_now_iso()
     }]
 
-    load_info = pipeline.run(
-        rows,
-        table_name="documents_master",
-        write_disposition="append"
-    )
 
-    # loads_ids is a list → NOT dict
-    try:
-        document_id = load_info.loads_ids[0]
-    except Exception:
-        logger.error(f"[DLT] Unable to extract document_id. load_info={load_info}")
-        raise
+# Postgres SQLSTATE for "column does not exist"
+UNDEFINED_COLUMN = "42703"
 
-    logger.success(f"[DLT] document_id = {document_id}")
-    return document_id
+
+def find_document_by_hash(pdf_hash):
+    """
+    document_id of an already-ingested PDF with the same SHA-256, or None.
+    Also None before the first load (no table / no pdf_hash column yet);
+    any other database error (connection, auth, SQL) is raised.
+    """
+    pipeline = get_dlt_pipeline()
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name("documents_master")
+            rows = client.execute_sql(
+                f"SELECT _dlt_load_id FROM {table} WHERE pdf_hash = %s LIMIT 1",
+                pdf_hash,
+            )
+    except DatabaseUndefinedRelation:
+        logger.info("[DLT] documents_master not created yet → no duplicate check")
+        return None
+    except DatabaseTerminalException as e:
+        if getattr(e.dbapi_exception, "pgcode", None) != UNDEFINED_COLUMN:
+            raise
+        logger.info("[DLT] documents_master has no pdf_hash column yet → no duplicate check")
+        return None
+
+    return rows[0][0] if rows else None
+
+
+def _current_load_id():
+    """
+    load_id of the package being extracted. documents_master rows get it
+    as _dlt_load_id, so child rows extracted in the same run can use it as
+    their document_id without a round trip.
+    """
+    return dlt.current.load_package_state()["load_id"]
+
+
+def _with_document_id(rows):
+    document_id = _current_load_id()
+    for row in rows:
+        yield {"document_id": document_id, **row}
 
 
 # ================================================================
 # 3. NORMALIZE parsed_data SAFELY
 # ================================================================
+def _normalize_list(parsed_data):
+    # Only keep dicts
+    final_list = [r for r in parsed_data if isinstance(r, dict)]
+    if len(final_list) != len(parsed_data):
+        logger.warning(f"[DLT] Skipping {len(parsed_data) - len(final_list)} non-dict parsed_data items")
+    return final_list
+
+
+def _normalize_dict(parsed_data):
+    # URA format
+    if "structured_data" in parsed_data:
+        return normalize_parsed_data(parsed_data["structured_data"])
+    return [parsed_data]
+
+
+def _normalize_other(parsed_data):
+    return _normalize_list([parsed_data])
+
+
+# type(parsed_data) → normalizer (one dict lookup instead of isinstance checks)
+_NORMALIZERS = {
+    list: _normalize_list,
+    dict: _normalize_dict,
+}
+
+
 def normalize_parsed_data(parsed_data):
     """Ensures we always return a list of dictionaries."""
-    if isinstance(parsed_data, dict):
-        # URA format
-        if "structured_data" in parsed_data:
-            parsed_data = parsed_data["structured_data"]
+    normalize = _NORMALIZERS.get(type(parsed_data))
+    if normalize is None:
+        # dict/list subclasses (OrderedDict, defaultdict, JSON-hook lists)
+        if isinstance(parsed_data, dict):
+            normalize = _normalize_dict
+        elif isinstance(parsed_data, list):
+            normalize = _normalize_list
         else:
-            parsed_data = [parsed_data]
+            normalize = _normalize_other
+    return normalize(parsed_data)
 
-    if not isinstance(parsed_data, list):
-        parsed_data = [parsed_data]
 
-    # Only keep dicts
-    final_list = []
-    for r in parsed_data:
-        if isinstance(r, dict):
-            final_list.append(r)
-        else:
-            logger.warning(f"[DLT] Skipping non-dict parsed_data item: {r}")
+# ================================================================
+# 4. STRUCTURED DATA → CHILD TABLE ROWS
+# ================================================================
+# pdf_type → (table, ((column, key in LLM record), ...))
+ROW_SCHEMAS = {
+    "construction_costing": ("cost_items", (
+        ("item_name", "item_name"),
+        ("quantity", "quantity"),
+        ("unit_price_yen", "unit_price"),
+        ("total_cost_yen", "total_cost"),
+        ("cost_type", "cost_type"),
+    )),
+    "project_schedule": ("project_tasks", (
+        ("task_name", "task_name"),
+        ("duration_days", "duration_days"),
+        ("start_date", "start_date"),
+        ("finish_date", "finish_date"),
+    )),
+    "ura_circular": ("regulatory_rules", (
+        ("rule_summary", "rule_summary"),
+        ("measurement_basis", "measurement_basis"),
+    )),
+}
+
+
+def _compile_row_builder(fields):
+    """
+    record → row function generated from a schema as ONE dict literal,
+    so the per-row work is a single call instead of a loop over fields.
+    """
+    body = ", ".join(f"{column!r}: get({key!r})" for column, key in fields)
+    namespace = {}
+    exec(f"def build_row(record):\n    get = record.get\n    return {{{body}}}", namespace)
+    return namespace["build_row"]
+
+
+# pdf_type → (table, build_row), compiled once at import
+ROW_BUILDERS = {
+    pdf_type: (table, _compile_row_builder(fields))
+    for pdf_type, (table, fields) in ROW_SCHEMAS.items()
+}
+
+
+def structured_rows(pdf_type, parsed_data):
+    """
+    Returns (table_name, rows) for a document's structured data, or
+    (None, []) for unsupported types. document_id is filled in at load time.
+    """
+    logger.info(f"[DLT] Preparing structured data for: {pdf_type}")
+
+    if pdf_type not in ROW_BUILDERS:
+        logger.warning(f"[DLT] Unsupported pdf_type: {pdf_type}")
+        return None, []
 
-    return final_list
+    table_name, build_row = ROW_BUILDERS[pdf_type]
+    parsed_data = normalize_parsed_data(parsed_data)
+
+    if pdf_type == "construction_costing":
+        # cost items are nested: [{"items": [...]}, ...]
+        items = list(chain.from_iterable(block.get("items") or () for block in parsed_data))
+        records = [item for item in items if isinstance(item, dict)]
+        if len(records) != len(items):
+            logger.warning(f"[DLT] Skipping {len(items) - len(records)} bad cost items")
+    else:
+        records = parsed_data
+
+    return table_name, [build_row(r) for r in records]
 
 
 # ================================================================
-# 4. LOAD STRUCTURED DATA INTO POSTGRES
+# 4b. ONE DLT RUN PER DOCUMENT (master + child rows)
 # ================================================================
-def load_structured_data(pipeline, pdf_type, document_id, parsed_data):
-    logger.info(f"[DLT] Loading structured data for: {pdf_type}")
+def load_document_rows(pipeline, pdf_name, pdf_type, parsed_data, pdf_hash=None):
+    """
+    Loads the documents_master row and its structured rows in a single
+    pipeline.run → one extract/normalize/load and one load package
+    instead of one per table. Returns the document_id (_dlt_load_id).
+    """
+    table_name, rows = structured_rows(pdf_type, parsed_data)
+
+    resources = [
+        dlt.resource(document_record(pdf_name, pdf_type, pdf_hash), name="documents_master")
+    ]
+    if rows:
+        resources.append(dlt.resource(_with_document_id(rows), name=table_name))
+
+    logger.info(f"[DLT] Inserting → documents_master ({pdf_name}) + {len(rows)} {table_name or 'structured'} rows")
 
-    parsed_data = normalize_parsed_data(parsed_data)
+    load_info = pipeline.run(
+        resources,
+        write_disposition="append",
+        loader_file_format=LOADER_FILE_FORMAT,
+    )
 
-    # ============================================================
-    # A) Construction Costing
-    # ============================================================
-    if pdf_type == "construction_costing":
-        rows = []
-        for block in parsed_data:
-            for item in block.get("items", []):
-                if not isinstance(item, dict):
-                    logger.warning(f"[DLT] Skipping bad item: {item}")
-                    continue
-                rows.append({
-                    "document_id": document_id,
-                    "item_name": item.get("item_name"),
-                    "quantity": item.get("quantity"),
-                    "unit_price_yen": item.get("unit_price"),
-                    "total_cost_yen": item.get("total_cost"),
-                    "cost_type": item.get("cost_type"),
-                })
-
-        if rows:
-            pipeline.run(rows, table_name="cost_items", write_disposition="append")
-            logger.success(f"[DLT] Inserted {len(rows)} construction cost rows")
-
-    # ============================================================
-    # B) Project Schedule
-    # ============================================================
-    elif pdf_type == "project_schedule":
-        rows = []
-        for t in parsed_data:
-            rows.append({
-                "document_id": document_id,
-                "task_name": t.get("task_name"),
-                "duration_days": t.get("duration_days"),
-                "start_date": t.get("start_date"),
-                "finish_date": t.get("finish_date"),
-            })
-
-        if rows:
-            pipeline.run(rows, table_name="project_tasks", write_disposition="append")
-            logger.success(f"[DLT] Inserted {len(rows)} project tasks")
-
-    # ============================================================
-    # C) URA Circular
-    # ============================================================
-    elif pdf_type == "ura_circular":
-        rows = []
-        for r in parsed_data:
-            rows.append({
-                "document_id": document_id,
-                "rule_summary": r.get("rule_summary"),
-                "measurement_basis": r.get("measurement_basis"),
-            })
-
-        if rows:
-            pipeline.run(rows, table_name="regulatory_rules", write_disposition="append")
-            logger.success(f"[DLT] Inserted {len(rows)} regulatory_rules rows")
+    # loads_ids is a list → NOT dict
+    try:
+        document_id = load_info.loads_ids[0]
+    except Exception:
+        logger.error(f"[DLT] Unable to extract document_id. load_info={load_info}")
+        raise
+
+    logger.success(f"[DLT] document_id = {document_id} ({len(rows)} structured rows)")
+    return document_id
 
-    else:
-        logger.warning(f"[DLT] Unsupported pdf_type: {pdf_type}")
 
-    logger.success("[DLT] Structured data load complete!")
 
 
 # ================================================================
@@ -156,56 +261,85 @@ def store_chunks_in_chroma_with_doc_id(chunks, document_id):
     logger.info(f"[CHROMA] Preparing {len(chunks)} chunks for DB insertion...")
 
     collection = get_collection("pdf_chunks")
-    embed_fn = get_embedding_function()
-
-    cleaned = []
+    # previously embedded texts are served from the ETL cache
+    embed_fn = get_cached_embedding_function()
+
+    # one pass: validate + dedup + build fresh chunk dicts (input chunks
+    # untouched). Repeated texts (page headers/footers, boilerplate) are
+    # embedded and stored once; the kept chunk counts its duplicates and
+    # lists every page the text appears on (Chroma metadata is scalar-only
+    # → "duplicate_pages" is a comma-joined string, e.g. "1,2,5").
+    canonical = {}
+    pages_of = {}
+    empty = 0
 
     for c in chunks:
-        if "id" not in c:
-            c["id"] = str(uuid.uuid4())
-
-        if "metadata" not in c or not isinstance(c["metadata"], dict):
-            c["metadata"] = {}
+        text = c.get("text")
+        if not text or text.isspace():
+            empty += 1
+            continue
 
-        c["metadata"]["document_id"] = document_id
+        kept = canonical.get(text)
+        if kept is not None:
+            kept_meta = kept["metadata"]
+            kept_meta["duplicates"] = kept_meta.get("duplicates", 0) + 1
 
-        if "text" not in c or not c["text"].strip():
-            logger.warning("[CHROMA] Skipping empty chunk")
+            pages = pages_of.get(text)
+            if pages is None:
+                pages = pages_of[text] = {kept_meta.get("page_number"): None}
+            meta = c.get("metadata")
+            pages[meta.get("page_number") if isinstance(meta, dict) else None] = None
             continue
 
-        cleaned.append(c)
+        meta = c.get("metadata")
+        canonical[text] = {
+            "id": c.get("id") or str(uuid.uuid4()),
+            "text": text,
+            "metadata": {**meta, "document_id": document_id}
+                        if isinstance(meta, dict)
+                        else {"document_id": document_id},
+        }
+
+    # dicts keep insertion order → kept chunks in document order, built
+    # as one exactly-sized list instead of growing a list per chunk
+    cleaned = list(canonical.values())
+
+    for text, pages in pages_of.items():
+        canonical[text]["metadata"]["duplicate_pages"] = ",".join(
+            str(p) for p in pages if p is not None
+        )
+
+    if empty:
+        logger.warning(f"[CHROMA] Skipping {empty} empty chunks")
+
+    duplicates = len(chunks) - empty - len(cleaned)
+    if duplicates:
+        logger.info(f"[CHROMA] Skipping {duplicates} duplicate chunks")
 
     if not cleaned:
         logger.warning("[CHROMA] No valid chunks to insert.")
         return
 
-    ids = [c["id"] for c in cleaned]
-    texts = [c["text"] for c in cleaned]
-    metadatas = [c["metadata"] for c in cleaned]
+    stored = store_chunks(collection, cleaned, embed_fn)
 
-    vectors = embed_fn(texts)
-    vectors = [v.values if hasattr(v, "values") else v for v in vectors]
-
-    collection.add(
-        ids=ids,
-        embeddings=vectors,
-        documents=texts,
-        metadatas=metadatas
-    )
-
-    logger.success(f"[CHROMA] Stored {len(cleaned)} chunks.")
+    logger.success(f"[CHROMA] Stored {stored} chunks.")
 
 
 # ================================================================
 # 6. FINAL WRAPPER
 # ================================================================
-def load_document_into_system(pdf_name, pdf_type, parsed_data, chunks):
+def load_document_into_system(pdf_name, pdf_type, parsed_data, chunks, pdf_hash=None):
     logger.info("[DLT] Starting full ingestion pipeline...")
 
     pipeline = get_dlt_pipeline()
-    document_id = load_document_record(pipeline, pdf_name, pdf_type)
 
-    load_structured_data(pipeline, pdf_type, document_id, parsed_data)
+    # Embeddings don't depend on document_id → compute them (into the
+    # embedding cache) while Postgres loads, then only Chroma adds remain
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        prefetch = ex.submit(warm_embedding_cache, [c.get("text") for c in chunks])
+        document_id = load_document_rows(pipeline, pdf_name, pdf_type, parsed_data, pdf_hash)
+        prefetch.result()
+
     store_chunks_in_chroma_with_doc_id(chunks, document_id)
 
     logger.success("🎉 Document stored successfully in Postgres + Chroma!")
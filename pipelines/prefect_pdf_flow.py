@@ -7,21 +7,40 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
 # Import modules
-from etl.pdf_classifier import detect_pdf_type
+from etl.cache import file_sha256
+from etl.pdf_classifier import classify_from_pages
 from etl.pdf_extractor import process_single_pdf
-from etl.pdf_chunking import chunk_document
+from etl.pdf_chunking import load_pages, chunk_from_pages
 
 # DLT loader
-from pipelines.dlt_pipeline import load_document_into_system
+from pipelines.dlt_pipeline import load_document_into_system, normalize_parsed_data, find_document_by_hash
+
+
+# ---------------------------------------------------
+# PRE-CHECK — SKIP PDFs ALREADY INGESTED (same bytes)
+# ---------------------------------------------------
+@task
+def task_check_duplicate(pdf_path: str):
+    pdf_hash = file_sha256(pdf_path)
+    return pdf_hash, find_document_by_hash(pdf_hash)
+
+
+# ---------------------------------------------------
+# TASK 0 — PARSE PDF ONCE (shared by classify + chunk)
+# ---------------------------------------------------
+@task
+def task_0_load_pages(pdf_path: str):
+    logger.info(f"[TASK 0] Parsing PDF pages: {pdf_path}")
+    return load_pages(pdf_path)
 
 
 # ---------------------------------------------------
 # TASK 1 — CLASSIFY PDF
 # ---------------------------------------------------
 @task
-def task_1_classify(pdf_path: str):
+def task_1_classify(pdf_path: str, pages: list):
     logger.info(f"[TASK 1] Classifying PDF: {pdf_path}")
-    return detect_pdf_type(pdf_path)
+    return classify_from_pages(pages, pdf_path)
 
 
 # ---------------------------------------------------
@@ -39,24 +58,23 @@ def task_2_extract(pdf_path: str, classifier: dict):
 
 
 # ---------------------------------------------------
-# TASK 3 — STORE INTO POSTGRES + CHROMA
+# TASK 2b — CHUNK FULL PDF (runs alongside TASK 2)
 # ---------------------------------------------------
 @task
-def task_3_load(pdf_path: str, pdf_type: str, parsed_data):
-    logger.info(f"[TASK 3] Chunking full document + loading into system...")
+def task_2b_chunk(pages: list, pdf_type: str):
+    logger.info(f"[TASK 2b] Chunking full document for type = {pdf_type}")
+    return chunk_from_pages(pages, pdf_type)
 
-    # --- Normalize parsed_data ---
-    if isinstance(parsed_data, dict):
-        if "structured_data" in parsed_data:
-            parsed_data = parsed_data["structured_data"]
-        else:
-            parsed_data = [parsed_data]
 
-    if not isinstance(parsed_data, list):
-        parsed_data = [parsed_data]
+# ---------------------------------------------------
+# TASK 3 — STORE INTO POSTGRES + CHROMA
+# ---------------------------------------------------
+@task
+def task_3_load(pdf_path: str, pdf_type: str, parsed_data, chunks: list, pdf_hash: str = None):
+    logger.info(f"[TASK 3] Loading {len(chunks)} chunks + structured data into system...")
 
-    # --- Chunk full PDF ---
-    chunks = chunk_document(pdf_path, pdf_type)
+    # --- Normalize parsed_data ---
+    parsed_data = normalize_parsed_data(parsed_data)
 
     # --- Load everything into Postgres + Chroma ---
     document_id = load_document_into_system(
@@ -64,6 +82,7 @@ def task_3_load(pdf_path: str, pdf_type: str, parsed_data):
         pdf_type=pdf_type,
         parsed_data=parsed_data,
         chunks=chunks,
+        pdf_hash=pdf_hash,
     )
 
     return document_id
@@ -74,18 +93,44 @@ def task_3_load(pdf_path: str, pdf_type: str, parsed_data):
 # ---------------------------------------------------
 @flow
 def pdf_ingestion_flow(pdf_path: str):
+    """
+    Parse → classify → extract + chunk → load one PDF.
+
+    A PDF whose SHA-256 is already in documents_master is skipped. The
+    check is not atomic (pdf_hash has no UNIQUE constraint), so two runs
+    for the same file started at the same time can both ingest it.
+    """
     logger.info(f"========== START PIPELINE for {pdf_path} ==========")
 
+    # PRE-CHECK: identical file already loaded → nothing to do
+    pdf_hash, existing_id = task_check_duplicate(pdf_path)
+    if existing_id is not None:
+        logger.success(f"[SKIP] Already ingested as document_id = {existing_id}")
+        return {"document_id": existing_id, "skipped": True}
+
+    # STEP 0: Parse pages once
+    pages = task_0_load_pages(pdf_path)
+
     # STEP 1: Classify
-    classifier = task_1_classify(pdf_path)
+    classifier = task_1_classify(pdf_path, pages)
+
+    pdf_type = classifier["pdf_type"]
 
-    # STEP 2: Extract
-    parsed_data = task_2_extract(pdf_path, classifier)
+    # STEP 2: Extract (LLM-bound) + chunk (CPU-bound) concurrently —
+    # they only share the pages parsed in step 0
+    parsed_future = task_2_extract.submit(pdf_path, classifier)
+    chunks_future = task_2b_chunk.submit(pages, pdf_type)
 
     # STEP 3: Load
-    document_id = task_3_load(pdf_path, classifier["pdf_type"], parsed_data)
+    document_id = task_3_load(pdf_path, pdf_type, parsed_future.result(), chunks_future.result(), pdf_hash)
 
     logger.success("🎉 PIPELINE COMPLETED SUCCESSFULLY!")
     return {"document_id": document_id}
 
 
+# ---------------------------------------------------
+# DEPLOYMENT (served by the worker process)
+# Django submits runs via run_deployment("pdf-ingestion-flow/default")
+# ---------------------------------------------------
+if __name__ == "__main__":
+    pdf_ingestion_flow.serve(name="default")
@@ -1,43 +1,42 @@
 import pytest
 from django.db import connection
 
-@pytest.fixture(autouse=True)
-def _setup_test_tables(db):
-    """
-    Auto-create minimal tables needed for tests (SQLite).
-    """
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS documents_master (
-                _dlt_load_id INTEGER PRIMARY KEY,
-                pdf_name TEXT,
-                pdf_type TEXT,
-                created_at TEXT
-            );
-        """)
+TEST_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS documents_master (
+        _dlt_load_id INTEGER PRIMARY KEY,
+        pdf_name TEXT,
+        pdf_type TEXT,
+        created_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS cost_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_id INTEGER,
+        item_name TEXT
+    );
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cost_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                document_id INTEGER,
-                item_name TEXT
-            );
-        """)
+    CREATE TABLE IF NOT EXISTS project_tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_id INTEGER,
+        task_name TEXT
+    );
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS project_tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                document_id INTEGER,
-                task_name TEXT
-            );
-        """)
+    CREATE TABLE IF NOT EXISTS regulatory_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_id INTEGER,
+        rule_summary TEXT
+    );
+"""
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS regulatory_rules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                document_id INTEGER,
-                rule_summary TEXT
-            );
-        """)
+
+@pytest.fixture(scope="session", autouse=True)
+def _setup_test_tables(django_db_setup, django_db_blocker):
+    """
+    Auto-create minimal tables needed for tests (SQLite), once per session
+    in a single executescript() instead of 4 statements per test.
+    """
+    with django_db_blocker.unblock():
+        with connection.cursor() as cursor:
+            cursor.executescript(TEST_TABLES_SQL)
 
     yield
@@ -0,0 +1,76 @@
+from collections import OrderedDict, UserDict
+from unittest.mock import MagicMock, patch
+
+import pytest
+from dlt.destinations.exceptions import DatabaseTransientException, DatabaseUndefinedRelation
+
+from pipelines.dlt_pipeline import (
+    find_document_by_hash,
+    normalize_parsed_data,
+    store_chunks_in_chroma_with_doc_id,
+)
+
+
+def _chunk(chunk_id, text, page_number):
+    return {"id": chunk_id, "text": text, "metadata": {"page_number": page_number}}
+
+
+def test_duplicate_chunks_stored_once_with_all_pages():
+    chunks = [
+        _chunk("a", "ACME Construction — Confidential", 1),
+        _chunk("b", "Foundation works: 120 m3 concrete", 1),
+        _chunk("c", "ACME Construction — Confidential", 2),
+    ]
+
+    with patch("pipelines.dlt_pipeline.get_collection"), \
+         patch("pipelines.dlt_pipeline.get_cached_embedding_function"), \
+         patch("pipelines.dlt_pipeline.store_chunks") as mock_store:
+        mock_store.side_effect = lambda collection, cleaned, embed_fn: len(cleaned)
+        store_chunks_in_chroma_with_doc_id(chunks, "doc-1")
+
+    stored = mock_store.call_args.args[1]
+    assert [c["id"] for c in stored] == ["a", "b"]
+
+    header = stored[0]["metadata"]
+    assert header["document_id"] == "doc-1"
+    assert header["duplicates"] == 1
+    assert header["duplicate_pages"] == "1,2"
+    assert "duplicate_pages" not in stored[1]["metadata"]
+
+
+def test_normalize_parsed_data_accepts_dict_and_list_subclasses():
+    rules = [{"rule_summary": "A"}, {"rule_summary": "B"}]
+
+    class JsonList(list):
+        pass
+
+    assert normalize_parsed_data(OrderedDict(structured_data=rules)) == rules
+    assert normalize_parsed_data(OrderedDict(rule_summary="A")) == [{"rule_summary": "A"}]
+    assert normalize_parsed_data(JsonList([rules[0], "junk"])) == [rules[0]]
+    # not a dict → wrapped, then dropped as a non-dict item
+    assert normalize_parsed_data(UserDict(rule_summary="A")) == []
+
+
+def _pipeline_with_query_result(**execute_sql):
+    pipeline = MagicMock()
+    client = pipeline.sql_client.return_value.__enter__.return_value
+    client.make_qualified_table_name.return_value = "pdf_dataset.documents_master"
+    client.execute_sql.configure_mock(**execute_sql)
+    return pipeline
+
+
+def test_find_document_by_hash_hit_and_first_load():
+    hit = _pipeline_with_query_result(return_value=[("1712345678.1",)])
+    with patch("pipelines.dlt_pipeline.get_dlt_pipeline", return_value=hit):
+        assert find_document_by_hash("abc") == "1712345678.1"
+
+    no_table = _pipeline_with_query_result(side_effect=DatabaseUndefinedRelation(Exception("no table")))
+    with patch("pipelines.dlt_pipeline.get_dlt_pipeline", return_value=no_table):
+        assert find_document_by_hash("abc") is None
+
+
+def test_find_document_by_hash_raises_on_connection_errors():
+    down = _pipeline_with_query_result(side_effect=DatabaseTransientException(Exception("connection refused")))
+    with patch("pipelines.dlt_pipeline.get_dlt_pipeline", return_value=down):
+        with pytest.raises(DatabaseTransientException):
+            find_document_by_hash("abc")
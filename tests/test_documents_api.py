@@ -1,3 +1,4 @@
+import json
 import pytest
 from django.db import connection
 
@@ -19,7 +20,7 @@ def test_documents_list(client):
     response = client.get("/api/documents/")
     assert response.status_code == 200
 
-    data = response.json()
+    data = json.loads(b"".join(response.streaming_content))
     assert len(data) > 0
 
     first = data[0]
@@ -0,0 +1,22 @@
+import uuid
+import pytest
+from unittest.mock import patch
+
+
+@pytest.mark.django_db
+def test_ingestion_status(client):
+    flow_run_id = uuid.uuid4()
+
+    with patch("django_app.ingestion.api.get_client") as mock_get_client:
+        prefect_client = mock_get_client.return_value.__enter__.return_value
+        flow_run = prefect_client.read_flow_run.return_value
+        flow_run.id = flow_run_id
+        flow_run.state.type.value = "RUNNING"
+        flow_run.state.name = "Running"
+
+        response = client.get(f"/api/ingestion-status/{flow_run_id}/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["flow_run_id"] == str(flow_run_id)
+    assert data["state"] == "RUNNING"
@@ -0,0 +1,25 @@
+import uuid
+
+from etl.pdf_chunking import chunk_page_text, uuid4_batch
+
+
+def test_uuid4_batch_ids_are_valid_and_unique():
+    ids = uuid4_batch(1000)
+
+    assert len(ids) == 1000
+    assert len(set(ids)) == 1000
+    for s in ids:
+        u = uuid.UUID(s)
+        assert u.version == 4
+        assert u.variant == uuid.RFC_4122
+        assert str(u) == s
+
+    assert uuid4_batch(0) == []
+
+
+def test_chunk_page_text_assigns_unique_uuid4_ids():
+    chunks = chunk_page_text(" ".join(["word"] * 1000), "ura_circular", page_number=1)
+
+    ids = [c["id"] for c in chunks]
+    assert len(set(ids)) == len(chunks) > 1
+    assert all(uuid.UUID(i).version == 4 for i in ids)
@@ -0,0 +1,71 @@
+import contextlib
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from etl.pdf_embedding import EMBED_MIN_BATCH, get_cached_embedding_function, store_chunks
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.batches.append(len(ids))
+
+
+@pytest.mark.parametrize("total, expected", [
+    # fewer than max_workers full batches → split evenly across workers
+    (200, [40, 40, 40, 40, 40]),
+    # full batches first, then the tail is split once
+    (1000, [128, 128, 128, 124, 124, 124, 124, 120]),
+    # tail split would be below the floor → EMBED_MIN_BATCH, smaller remainder last
+    (30, [EMBED_MIN_BATCH, 30 - EMBED_MIN_BATCH]),
+])
+def test_store_chunks_batch_sizes(total, expected):
+    embedded = []
+
+    def embed_fn(texts):
+        embedded.append(len(texts))
+        return [[1.0, 0.0]] * len(texts)
+
+    chunks = [{"id": str(i), "text": f"chunk {i}", "metadata": {}} for i in range(total)]
+    collection = FakeCollection()
+
+    stored = store_chunks(collection, chunks, embed_fn, batch_size=128, max_workers=5)
+
+    assert stored == total
+    # adds happen in order; embeds may finish in any order
+    assert collection.batches == expected
+    assert sorted(embedded) == sorted(expected)
+
+
+class FakeCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+    def transact(self):
+        return contextlib.nullcontext()
+
+
+def test_cached_embeddings_same_precision_on_miss_and_hit():
+    calls = []
+
+    def embed_fn(texts):
+        calls.append(list(texts))
+        return [[0.1234567, 0.7654321, 1 / 3]] * len(texts)
+
+    get_cached_embedding_function.cache_clear()
+    try:
+        with patch("etl.pdf_embedding.get_embedding_function", return_value=embed_fn), \
+             patch("etl.pdf_embedding.cache", FakeCache()):
+            cached_embed_fn = get_cached_embedding_function()
+            miss = cached_embed_fn(["boilerplate"])
+            hit = cached_embed_fn(["boilerplate"])
+    finally:
+        get_cached_embedding_function.cache_clear()
+
+    assert calls == [["boilerplate"]]
+    assert miss[0].dtype == hit[0].dtype == np.float32
+    np.testing.assert_array_equal(miss[0], hit[0])
@@ -0,0 +1,42 @@
+import json
+
+from etl.pdf_extractor import _has_grid, _parse_batch_results
+
+
+PAGES = [{"page_number": 3}, {"page_number": 4}]
+
+
+def test_batch_results_accept_string_and_float_page_numbers():
+    llm_raw = json.dumps([
+        {"page_number": "4", "items": [{"rule_summary": "B"}]},
+        {"page_number": 3.0, "items": [{"rule_summary": "A"}]},
+    ])
+
+    results = _parse_batch_results("ura_circular", PAGES, llm_raw)
+
+    # page order, each item tagged with its (int) page number
+    assert [r["rule_summary"] for r in results] == ["A", "B"]
+    assert [r["page_number"] for r in results] == [3, 4]
+
+
+def test_batch_results_page_missing_from_response():
+    llm_raw = json.dumps([
+        {"page_number": 4, "items": [{"rule_summary": "B"}]},
+        {"page_number": "not a page", "items": [{"rule_summary": "X"}]},
+    ])
+
+    results = _parse_batch_results("ura_circular", PAGES, llm_raw)
+
+    assert [r["rule_summary"] for r in results] == ["B"]
+
+
+class _Page:
+    def __init__(self, orientations):
+        self.edges = [{"orientation": o} for o in orientations]
+
+
+def test_has_grid_ignores_curve_edges():
+    assert _has_grid(_Page(["h", "h", "v", "v"]))
+    # diagonal/curved strokes (orientation None) are not vertical rules
+    assert not _has_grid(_Page(["h", "h", None, None, None]))
+    assert not _has_grid(_Page(["h", "v", None, None]))
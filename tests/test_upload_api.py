@@ -1,4 +1,5 @@
 import io
+import uuid
 import pytest
 from unittest.mock import patch
 
@@ -8,8 +9,10 @@ def test_upload_pdf(client):
     fake_pdf = io.BytesIO(b"%PDF-1.4 test pdf")
     fake_pdf.name = "test_file.pdf"
 
-    with patch("django_app.ingestion.api.pdf_ingestion_flow") as mock_flow:
-        mock_flow.return_value = {"state": "success"}
+    flow_run_id = uuid.uuid4()
+
+    with patch("django_app.ingestion.api.run_deployment") as mock_run:
+        mock_run.return_value.id = flow_run_id
 
         response = client.post(
             "/api/upload-pdf/",
@@ -17,7 +20,9 @@ def test_upload_pdf(client):
             format="multipart"
         )
 
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert "status" in data
-    assert data["status"] == "Ingestion triggered"
+    assert data["status"] == "queued"
+    assert data["flow_run_id"] == str(flow_run_id)
+    assert mock_run.call_args.kwargs["timeout"] == 0